@@ -0,0 +1,234 @@
+"""
+Asyncio server that serves many robots at once on one base station.
+
+Every connection speaks the same protocol as the single-robot servers
+(8-byte "Q" length + JPEG, text reply). Detection runs in a pool of worker
+processes shared by all connections, so the event loop only moves bytes.
+Each robot is pinned to one worker process (the least loaded when it
+connects), which keeps that robot's detector state between frames: a
+LineTracker with --tracking, an AutoCalibrator following the robot's own
+lighting with --auto-calibration.
+
+    python async_server.py --detector line --workers 4
+    python async_server.py --detector line --tracking --auto-calibration
+    python async_server.py --detector line --binary   # fixed-size replies from reply_protocol.py
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import os
+import struct
+import time
+
+from auto_calibration import AutoCalibrator
+from color_classifier import HSVColorClassifier
+from frame_decoder import decode_frame
+from frame_receiver import MAX_FRAME_SIZE
+from line_tracker import LineTracker
+from reply_protocol import encode_reply
+from script_loader import load_script
+
+HEADER = struct.Struct("Q")
+# Reply to a frame the detector could not process (undecodable frame, detector error): stop, state unknown
+ERROR_FIELDS = {"decision": "STOP", "stop_state": "UNKNOWN"}
+
+# detector name -> (script, function, decode mode (frame_decoder.py),
+#                   how to get the reply fields (encode_reply arguments) from its result)
+DETECTORS = {
+    "line": ("new_line_detector_v2", "detect_black_line_and_color", "color",
+             lambda result: {"decision": result[4], "deviation_value": result[5], "line_color": result[6]}),
+    "stop": ("stop_detector_with_camera_ras", "detect_stop_symbol", "gray", lambda result: {"decision": result}),
+    "percentage": ("percentage_stopper.py", "detect_horizontal_lines", "gray",
+                   lambda result: {"decision": result[0], "stop_state": "CONTINUE" if result[0] == "FORWARD" else result[0]}),
+}
+
+
+def detect_reply_fields(detector, frame_data):
+    """Decodes one JPEG frame and runs the named detector on it. Runs inside a pool worker."""
+    script, function, decode_mode, fields_of = DETECTORS[detector]
+    detect = getattr(load_script(script), function)
+    return fields_of(detect(decode_frame(frame_data, decode_mode)))
+
+
+def run_detector(detector, frame_data):
+    """Like detect_reply_fields, but returns only the text reply."""
+    return detect_reply_fields(detector, frame_data)["decision"]
+
+
+class SessionDetector:
+    """
+    One robot's detector and its state across frames. Lives in the pool
+    process the robot is pinned to.
+
+    tracking: a LineTracker ("line" only). auto_calibration: an AutoCalibrator
+    that sets the threshold (and for "line" the color classifier) from this
+    robot's frames ("line" and "percentage").
+    """
+
+    def __init__(self, detector, tracking=False, auto_calibration=False):
+        script, function, self.decode_mode, self.fields_of = DETECTORS[detector]
+        module = load_script(script)
+        self.detector = detector
+        self.detect = getattr(module, function)
+        self.tracker = LineTracker(color_classifier=HSVColorClassifier(module.COLOR_RANGES)) if tracking else None
+        self.calibration = None
+        if auto_calibration:
+            self.calibration = AutoCalibrator(module.COLOR_RANGES) if detector == "line" else AutoCalibrator(threshold=50)
+
+    def reply_fields(self, frame_data):
+        frame = decode_frame(frame_data, self.decode_mode)
+        if self.calibration is None:
+            result = self.tracker.update(frame) if self.tracker is not None else self.detect(frame)
+            return self.fields_of(result)
+
+        self.calibration.update(frame)
+        threshold, classifier = self.calibration.threshold, self.calibration.classifier
+        if self.tracker is not None:
+            self.tracker.threshold, self.tracker.color_classifier = threshold, classifier
+            return self.fields_of(self.tracker.update(frame))
+        if self.detector == "line":
+            return self.fields_of(self.detect(frame, threshold, color_classifier=classifier))
+        return self.fields_of(self.detect(frame, threshold))
+
+
+# Session id -> SessionDetector of the robots pinned to this pool process
+_SESSION_DETECTORS = {}
+
+
+def session_reply_fields(session_id, detector, tracking, auto_calibration, frame_data):
+    """Runs one frame through the robot's SessionDetector. Runs inside the pool process the robot is pinned to."""
+    state = _SESSION_DETECTORS.get(session_id)
+    if state is None:
+        state = _SESSION_DETECTORS[session_id] = SessionDetector(detector, tracking, auto_calibration)
+    return state.reply_fields(frame_data)
+
+
+def end_session(session_id):
+    """Drops a disconnected robot's detector state. Runs inside the pool process it was pinned to."""
+    _SESSION_DETECTORS.pop(session_id, None)
+
+
+class RobotSession:
+    """Per-connection state: the pool process holding the robot's detector, last decision and latency history."""
+
+    def __init__(self, session_id, addr, detector, worker, history=1000):
+        self.session_id = session_id
+        self.addr = addr
+        self.detector = detector
+        self.worker = worker  # Index of the pool process that keeps this robot's SessionDetector
+        self.frames = 0
+        self.last_reply = None
+        self.latencies = collections.deque(maxlen=history)
+        self.started = time.monotonic()
+
+    def record(self, reply, latency):
+        self.frames += 1
+        self.last_reply = reply
+        self.latencies.append(latency)
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        latencies = sorted(self.latencies)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        return f"{self.addr}: {self.frames} frames, {self.frames / elapsed:.1f} FPS, latency p50 {p50:.1f} ms"
+
+
+class MultiRobotServer:
+    def __init__(self, detector="line", workers=None, binary=False, tracking=False, auto_calibration=False):
+        self.detector = detector
+        self.binary = binary
+        self.tracking = tracking
+        self.auto_calibration = auto_calibration
+        # One single-process executor per worker, so a robot's frames always reach the process with its state
+        self.pools = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(workers or os.cpu_count())]
+        self.sessions = {}
+        self.next_session_id = 0
+
+    def _least_loaded_worker(self):
+        load = collections.Counter(session.worker for session in self.sessions.values())
+        return min(range(len(self.pools)), key=lambda worker: load[worker])
+
+    async def handle_robot(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        session = RobotSession(self.next_session_id, addr, self.detector, self._least_loaded_worker())
+        self.sessions[addr] = session
+        self.next_session_id += 1
+        pool = self.pools[session.worker]
+        loop = asyncio.get_running_loop()
+        print(f"Connected to {addr}")
+
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                size = HEADER.unpack(header)[0]
+                if size > MAX_FRAME_SIZE:
+                    print(f"Frame header announces {size} bytes, more than {MAX_FRAME_SIZE}; closing.")
+                    break
+                frame_data = await reader.readexactly(size)
+                received_at = time.monotonic()
+
+                try:
+                    fields = await loop.run_in_executor(pool, session_reply_fields, session.session_id, session.detector,
+                                                        self.tracking, self.auto_calibration, frame_data)
+                except Exception as error:
+                    print(f"{addr}: frame {session.frames} failed: {error!r}")
+                    fields = ERROR_FIELDS
+                reply = fields["decision"]
+                if self.binary:
+                    writer.write(encode_reply(session.frames, processing_time=time.monotonic() - received_at, **fields))
+                else:
+                    writer.write(reply.encode())
+                await writer.drain()
+                session.record(reply, time.monotonic() - received_at)
+        except asyncio.IncompleteReadError as e:
+            print("Client disconnected." if not e.partial else "Client disconnected mid-frame.")
+        except (ConnectionResetError, BrokenPipeError):
+            print("Connection lost.")
+        finally:
+            print(session.summary())
+            del self.sessions[addr]
+            try:
+                pool.submit(end_session, session.session_id)
+            except RuntimeError:
+                pass  # The pools are already shut down: the server is closing
+            writer.close()
+
+    async def serve(self, host="0.0.0.0", port=8080):
+        server = await asyncio.start_server(self.handle_robot, host, port)
+        print("Waiting for connections...")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default="line")
+    parser.add_argument("--workers", type=int, default=None, help="detection processes (default: one per core)")
+    parser.add_argument("--binary", action="store_true", help="reply with fixed-size binary structs instead of text")
+    parser.add_argument("--tracking", action="store_true", help="track each robot's line (LineTracker, line only)")
+    parser.add_argument("--auto-calibration", action="store_true",
+                        help="calibrate the threshold to each robot's lighting (line and percentage)")
+    args = parser.parse_args()
+    if args.tracking and args.detector != "line":
+        parser.error("--tracking needs --detector line")
+    if args.auto_calibration and args.detector not in ("line", "percentage"):
+        parser.error("--auto-calibration needs --detector line or percentage")
+
+    server = MultiRobotServer(args.detector, args.workers, args.binary, args.tracking, args.auto_calibration)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
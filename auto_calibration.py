@@ -0,0 +1,125 @@
+import threading
+
+import cv2
+import numpy as np
+
+from color_classifier import HSVColorClassifier
+
+
+class AutoCalibrator:
+    """
+    Follows the lighting of a stream and derives the black threshold and the
+    HSV color bounds from it, instead of fixed values or per-frame statistics.
+
+    Lighting is measured on a gray subsample of the frame (every `stride`-th
+    pixel in both directions, taken with a nearest-neighbour resize), never
+    on the full frame:
+      - brightness: mean gray level of the sample
+      - black threshold: the sample is split into dark and light with Otsu's
+        method and the threshold is put halfway between the two class means,
+        clamped to threshold_range. When the sample is not bimodal (class
+        means closer than min_contrast, e.g. no line in view) the threshold
+        follows the brightness instead.
+    Both feed exponential moving averages with weight alpha, so a single odd
+    frame cannot make the thresholds jump. The measurement is only repeated
+    every `every` frames, or sooner while the sample brightness is more than
+    `shift` away from the average (e.g. when driving into a shadow).
+
+    Color bounds keep their hue and saturation; only the V bounds are scaled
+    by brightness / reference_brightness, the lighting the table was tuned
+    for. An upper V of 255 stays open. The bound arrays and the compiled
+    HSVColorClassifier are cached and only rebuilt when a bound changes.
+
+    update() holds a lock, so one calibrator can be shared by several worker
+    threads (OpenCV releases the GIL in the middle of an update).
+
+        calibration = AutoCalibrator(COLOR_RANGES)
+        calibration.update(frame)
+        detect(frame, calibration.threshold, color_classifier=calibration.classifier)
+    """
+
+    def __init__(self, color_ranges=None, threshold=60, reference_brightness=200, every=15, shift=12.0,
+                 alpha=0.3, stride=8, threshold_range=(20, 120), min_contrast=40):
+        self.base_threshold = threshold
+        self.reference_brightness = reference_brightness
+        self.every = every
+        self.shift = shift
+        self.alpha = alpha
+        self.stride = stride
+        self.threshold_range = threshold_range
+        self.min_contrast = min_contrast
+
+        self.colors = list(color_ranges or {})
+        ranges = list((color_ranges or {}).values())
+        self.base_lower = np.array([lower for lower, _ in ranges], dtype=np.float64).reshape(-1, 3)
+        self.base_upper = np.array([upper for _, upper in ranges], dtype=np.float64).reshape(-1, 3)
+        self.lower = self.upper = None  # Current bounds, (colors, 3) uint8
+        self.classifier = None
+
+        self.brightness = None  # Moving averages
+        self._threshold = float(threshold)
+        self.frames_since = 0
+        self.recalibrations = 0
+        self.lock = threading.Lock()
+        self._compile()
+
+    @property
+    def threshold(self):
+        """Current black threshold for cv2.threshold."""
+        return int(round(self._threshold))
+
+    def _sample(self, frame):
+        height, width = frame.shape[:2]
+        size = (max(width // self.stride, 1), max(height // self.stride, 1))
+        sample = cv2.resize(frame, size, interpolation=cv2.INTER_NEAREST)
+        return sample if sample.ndim == 2 else cv2.cvtColor(sample, cv2.COLOR_BGR2GRAY)
+
+    def _target_threshold(self, gray):
+        otsu, dark = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        dark_pixels = cv2.countNonZero(dark)
+        if 0 < dark_pixels < gray.size:
+            dark_mean, light_mean = cv2.mean(gray, dark)[0], cv2.mean(gray, cv2.bitwise_not(dark))[0]
+        else:
+            dark_mean = light_mean = otsu
+        if light_mean - dark_mean >= self.min_contrast:
+            target = (dark_mean + light_mean) / 2
+        else:
+            target = self.base_threshold * self.brightness / self.reference_brightness
+        return float(np.clip(target, *self.threshold_range))
+
+    def _compile(self):
+        """Scales the V bounds by the brightness and recompiles the classifier if any bound changed."""
+        gain = 1.0 if self.brightness is None else self.brightness / self.reference_brightness
+        lower, upper = self.base_lower.copy(), self.base_upper.copy()
+        lower[:, 2] *= gain
+        upper[:, 2] = np.where(upper[:, 2] >= 255, 255, upper[:, 2] * gain)
+        lower = np.clip(np.rint(lower), 0, 255).astype(np.uint8)
+        upper = np.clip(np.rint(upper), 0, 255).astype(np.uint8)
+        if self.classifier is not None and np.array_equal(lower, self.lower) and np.array_equal(upper, self.upper):
+            return
+        self.lower, self.upper = lower, upper
+        self.classifier = HSVColorClassifier({color: (lower[i], upper[i]) for i, color in enumerate(self.colors)})
+
+    def update(self, frame):
+        """Feeds one frame. Returns True if the thresholds were recalibrated on it."""
+        with self.lock:
+            return self._update(frame)
+
+    def _update(self, frame):
+        self.frames_since += 1
+        gray = self._sample(frame)
+        brightness = cv2.mean(gray)[0]
+        if self.brightness is None:
+            self.brightness = brightness
+        elif self.frames_since < self.every and abs(brightness - self.brightness) <= self.shift:
+            return False
+        else:
+            self.brightness += self.alpha * (brightness - self.brightness)
+
+        # The first measurement is taken as is, later ones are averaged in
+        alpha = self.alpha if self.recalibrations else 1.0
+        self._threshold += alpha * (self._target_threshold(gray) - self._threshold)
+        self._compile()
+        self.frames_since = 0
+        self.recalibrations += 1
+        return True
@@ -1,7 +1,18 @@
 import cv2
 import numpy as np
 
-def detect_black_line_and_color(frame, threshold=60):
+from color_classifier import HSVColorClassifier
+from section_centroids import compute_section_centroids
+
+# กำหนดช่วงค่าสีสำหรับตรวจจับ (คอมไพล์เป็นตาราง Lookup ครั้งเดียว)
+COLOR_CLASSIFIER = HSVColorClassifier({
+    "BLACK": [(0, 0, 0), (180, 255, 50)],  # สีดำ
+    "RED": [(0, 120, 70), (10, 255, 255)],  # สีแดง
+    "GREEN": [(35, 40, 40), (85, 255, 255)],  # สีเขียว (ปรับค่าจากเดิม)
+    "BLUE": [(90, 50, 70), (128, 255, 255)]  # สีน้ำเงิน
+})
+
+def detect_black_line_and_color(frame, threshold=60, num_sections=4):
     """
     ฟังก์ชันสำหรับตรวจจับเส้นสีดำ, คำนวณทิศทาง และตรวจจับสีของเส้นที่เป็น (ดำ, แดง, เขียว, น้ำเงิน)
     """
@@ -29,58 +40,26 @@ def detect_black_line_and_color(frame, threshold=60):
         epsilon = 0.005 * cv2.arcLength(largest_contour, True)
         contour_path = cv2.approxPolyDP(largest_contour, epsilon, True)
 
-        # สร้าง Mask ของเส้นดำ
-        line_mask = np.zeros_like(mask)
-        cv2.drawContours(line_mask, [largest_contour], -1, 255, thickness=cv2.FILLED)
+        # หา Bounding Box ของเส้นดำ และสร้าง Mask ของเส้นเฉพาะในกรอบนั้น
+        x, y, w, h = cv2.boundingRect(largest_contour)
+        line_mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.drawContours(line_mask, [largest_contour], -1, 255, thickness=cv2.FILLED, offset=(-x, -y))
 
-        # แปลงภาพเป็น HSV เพื่อใช้ตรวจจับสี
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        # แปลงเฉพาะกรอบของเส้นเป็น HSV แล้วนับพิกเซลของทุกสีในครั้งเดียว
+        hsv = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2HSV)
+        color_counts = COLOR_CLASSIFIER.count(hsv, line_mask)
 
-        # กำหนดช่วงค่าสีสำหรับตรวจจับ
-        color_ranges = {
-            "BLACK": [(0, 0, 0), (180, 255, 50)],  # สีดำ
-            "RED": [(0, 120, 70), (10, 255, 255)],  # สีแดง
-            "GREEN": [(35, 40, 40), (85, 255, 255)],  # สีเขียว (ปรับค่าจากเดิม)
-            "BLUE": [(90, 50, 70), (128, 255, 255)]  # สีน้ำเงิน
-        }
-
-        # ตรวจจับสีของเส้น
-        for color, (lower, upper) in color_ranges.items():
-            color_mask = cv2.inRange(hsv, np.array(lower), np.array(upper))  # สร้าง Mask สำหรับสี
-            color_mask = cv2.bitwise_and(color_mask, color_mask, mask=line_mask)  # ตรวจสอบเฉพาะพื้นที่เส้น
-
-            if cv2.countNonZero(color_mask) > 500:  # ถ้ามีสีมากพอ
-                line_color = f"{color} DETECTED"
-                break  # พบสีแล้ว หยุดทำงาน
+        # ตรวจจับสีของเส้น (สีแรกที่มีพิกเซลมากกว่า 500)
+        color = COLOR_CLASSIFIER.first_detected(color_counts, 500)
+        if color:
+            line_color = f"{color} DETECTED"
 
         # คำนวณทิศทางของหุ่นยนต์จากเส้นดำ
-        x, y, w, h = cv2.boundingRect(largest_contour)  # หา Bounding Box ของเส้นดำ
-        section_height = h // 4  # แบ่งเส้นออกเป็น 4 ส่วน
         frame_center = frame.shape[1] // 2  # กึ่งกลางของเฟรม
 
-        top_dot = None
-        for i in range(4):  # วนลูปตรวจจับจุดกลางของแต่ละส่วน
-            section_y = int(y + (i + 0.5) * section_height)  # คำนวณตำแหน่งแกน Y
-            middle_points.append((frame_center, section_y))
-
-            # สร้าง Mask เฉพาะบริเวณที่ต้องการ
-            section_mask = np.zeros_like(mask)
-            section_mask[max(0, section_y - section_height // 2):section_y + section_height // 2, :] = mask[
-                max(0, section_y - section_height // 2):section_y + section_height // 2, :]
-
-            section_contours, _ = cv2.findContours(section_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            if section_contours:
-                section_largest = max(section_contours, key=cv2.contourArea)
-                M = cv2.moments(section_largest)
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    deviation = cx - frame_center
-                    deviations.append((cx, cy, deviation))
-
-                    if i == 0:  # จุดบนสุดของเส้น
-                        top_dot = (cx, cy)
+        # หาจุดกลางของทุกส่วนของเส้นในครั้งเดียว (แบ่งเป็น num_sections ส่วน)
+        deviations, middle_points, top_dot = compute_section_centroids(
+            mask, (x, y, w, h), frame_center, num_sections)
 
         if deviations:
             deviation_value = deviations[-1][2]
@@ -106,44 +85,45 @@ def detect_black_line_and_color(frame, threshold=60):
 
     return mask, deviations, middle_points, contour_path, direction, deviation_value, line_color
 
-# เปิดกล้อง
-cap = cv2.VideoCapture(0)
+if __name__ == "__main__":
+    # เปิดกล้อง
+    cap = cv2.VideoCapture(0)
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
 
-    # ตรวจจับเส้นดำ + คำนวณทิศทาง + ตรวจจับสีของเส้น
-    mask, deviations, middle_points, contour_path, direction, deviation_value, line_color = detect_black_line_and_color(frame)
+        # ตรวจจับเส้นดำ + คำนวณทิศทาง + ตรวจจับสีของเส้น
+        mask, deviations, middle_points, contour_path, direction, deviation_value, line_color = detect_black_line_and_color(frame)
 
-    # วาดจุดกลางของแต่ละส่วนบนเฟรม
-    for (mx, my) in middle_points:
-        cv2.circle(frame, (mx, my), 5, (0, 0, 255), -1)
+        # วาดจุดกลางของแต่ละส่วนบนเฟรม
+        for (mx, my) in middle_points:
+            cv2.circle(frame, (mx, my), 5, (0, 0, 255), -1)
 
-    for (cx, cy, deviation) in deviations:
-        cv2.circle(frame, (cx, cy), 5, (255, 0, 0), -1)
-        cv2.putText(frame, f"Dev: {deviation}", (cx, cy-10), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+        for (cx, cy, deviation) in deviations:
+            cv2.circle(frame, (cx, cy), 5, (255, 0, 0), -1)
+            cv2.putText(frame, f"Dev: {deviation}", (cx, cy-10), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
 
-    if contour_path is not None:
-        cv2.drawContours(frame, [contour_path], -1, (0, 255, 0), 2)
+        if contour_path is not None:
+            cv2.drawContours(frame, [contour_path], -1, (0, 255, 0), 2)
 
-    # แสดงข้อมูลทิศทาง และสีของเส้นบนเฟรม
-    cv2.putText(frame, f"Direction: {direction}", (50, 50), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-    cv2.putText(frame, f"Deviation: {deviation_value}", (50, 90), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-    cv2.putText(frame, f"Line Color: {line_color}", (50, 130), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        # แสดงข้อมูลทิศทาง และสีของเส้นบนเฟรม
+        cv2.putText(frame, f"Direction: {direction}", (50, 50), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+        cv2.putText(frame, f"Deviation: {deviation_value}", (50, 90), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+        cv2.putText(frame, f"Line Color: {line_color}", (50, 130), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-    # แสดงผล
-    cv2.imshow("Original Frame", frame)
-    cv2.imshow("Binary Mask", mask)
+        # แสดงผล
+        cv2.imshow("Original Frame", frame)
+        cv2.imshow("Binary Mask", mask)
 
-    # กด 'q' เพื่อออกจากโปรแกรม
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+        # กด 'q' เพื่อออกจากโปรแกรม
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
 
-cap.release()
-cv2.destroyAllWindows()
+    cap.release()
+    cv2.destroyAllWindows()
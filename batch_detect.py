@@ -0,0 +1,220 @@
+"""
+Runs a detector over recorded video files and image directories in parallel.
+
+Inputs are split into chunks of frames (a frame range of a video, or a list of
+image files) and processed on a process pool. Results are written in input
+order as JSON Lines, or as columns (.npz, or .parquet when pyarrow is
+installed). Detector keyword arguments can be overridden to re-score a
+recording after a threshold change.
+
+    python batch_detect.py runs/*.mp4 --detector line --output line.jsonl
+    python batch_detect.py frames/ --detector percentage --param area_threshold=70 --output grid.npz
+"""
+import argparse
+import ast
+import concurrent.futures
+import contextlib
+import inspect
+import io
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from script_loader import load_script
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+OUTPUT_EXTENSIONS = (".jsonl", ".npz", ".parquet")
+
+# detector name -> (script, function, JSON-friendly fields of its result)
+BATCH_DETECTORS = {
+    "line": ("new_line_detector_v2", "detect_black_line_and_color",
+             lambda result: {"decision": result[4], "deviation_value": int(result[5]), "line_color": result[6],
+                             "sections": [[int(v) for v in section] for section in result[1]]}),
+    "stop": ("stop_detector_with_camera_ras", "detect_stop_symbol", lambda result: {"decision": result}),
+    "percentage": ("percentage_stopper.py", "detect_horizontal_lines",
+                   lambda result: {"decision": result[0], "black_percentages": [float(p) for p in result[1]]}),
+    "color": ("percentage with color.py", "detect_colors",
+              lambda result: {"decision": result[0], "percentages": [[float(p) for p in box] for box in result[1]]}),
+}
+
+
+def make_chunks(inputs, chunk_size):
+    """Splits videos into frame ranges and image directories into file lists: (kind, source, items)."""
+    chunks = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                           if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+            chunks += [("images", path, files[i:i + chunk_size]) for i in range(0, len(files), chunk_size)]
+        elif os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            chunks.append(("images", os.path.dirname(path), [path]))
+        else:
+            capture = cv2.VideoCapture(path)
+            if not capture.isOpened():
+                raise SystemExit(f"Cannot open {path}")
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+            if frame_count <= 0:
+                chunks.append(("video", path, (0, None)))  # Unknown length: one sequential chunk
+            else:
+                chunks += [("video", path, (start, min(chunk_size, frame_count - start)))
+                           for start in range(0, frame_count, chunk_size)]
+    return chunks
+
+
+def _frames(kind, source, items):
+    """Yields (frame id, frame) for one chunk."""
+    if kind == "images":
+        for path in items:
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield os.path.relpath(path, source), frame
+        return
+
+    start, count = items
+    capture = cv2.VideoCapture(source)
+    if start:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    index = start
+    while count is None or index < start + count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield index, frame
+        index += 1
+    capture.release()
+
+
+def _init_worker():
+    # One OpenCV thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def process_chunk(detector, params, chunk):
+    """Runs the detector over one chunk. Runs inside a pool worker."""
+    script, function, fields_of = BATCH_DETECTORS[detector]
+    detect = getattr(load_script(script), function)
+    kind, source, items = chunk
+    records = []
+    # Some detectors print their decisions; keep the worker output quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        for frame_id, frame in _frames(kind, source, items):
+            record = {"source": source, "frame": frame_id}
+            record.update(fields_of(detect(frame, **params)))
+            records.append(record)
+    return records
+
+
+class JsonLinesWriter:
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnarWriter:
+    """Collects records and writes them as one column per field at close. Nested values are stored as JSON strings."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow.parquet
+            except ImportError:
+                raise SystemExit("Writing .parquet needs pyarrow; use .npz or .jsonl instead")
+
+    def write(self, records):
+        self.records += records
+
+    def close(self):
+        names = list(dict.fromkeys(name for record in self.records for name in record))
+        columns = {name: [self._cell(record.get(name)) for record in self.records] for name in names}
+        if self.path.endswith(".parquet"):
+            import pyarrow
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(pyarrow.table(columns), self.path)
+        else:
+            arrays = {}
+            for name, column in columns.items():
+                array = np.asarray(column)
+                # Mixed types (e.g. video frame numbers and image names) end up as object arrays
+                arrays[name] = array.astype(str) if array.dtype == object else array
+            np.savez(self.path, **arrays)
+
+    @staticmethod
+    def _cell(value):
+        return json.dumps(value) if isinstance(value, (list, dict)) else value
+
+
+def parse_params(pairs):
+    """["threshold=70", ...] -> {"threshold": 70, ...}"""
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            params[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            params[key] = value
+    return params
+
+
+def output_path(path):
+    """argparse type: the output file must have one of OUTPUT_EXTENSIONS (np.savez would silently append .npz)."""
+    if not path.endswith(OUTPUT_EXTENSIONS):
+        raise argparse.ArgumentTypeError(f"{path!r} must end in one of {', '.join(OUTPUT_EXTENSIONS)}")
+    return path
+
+
+def check_params(detector, params):
+    """Raises TypeError if the detector function does not accept params as keyword arguments."""
+    script, function, _ = BATCH_DETECTORS[detector]
+    signature = inspect.signature(getattr(load_script(script), function))
+    signature.bind(None, **params)  # The frame, then the overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="video files, image files or directories of images")
+    parser.add_argument("--detector", choices=sorted(BATCH_DETECTORS), default="line")
+    parser.add_argument("--output", type=output_path, default="results.jsonl", help=".jsonl, .npz or .parquet")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="detector keyword argument, e.g. threshold=70 (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="frames per task")
+    args = parser.parse_args()
+
+    params = parse_params(args.param)
+    try:
+        check_params(args.detector, params)  # Before the pool starts and the output file is created
+    except TypeError as error:
+        parser.error(f"--param does not fit the {args.detector} detector: {error}")
+    chunks = make_chunks(args.inputs, args.chunk_size)
+    writer = JsonLinesWriter(args.output) if args.output.endswith(".jsonl") else ColumnarWriter(args.output)
+
+    start = time.perf_counter()
+    frames = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(process_chunk, args.detector, params, chunk) for chunk in chunks]
+        # Results are written in input order as soon as each chunk (and all before it) is done
+        for future in futures:
+            records = future.result()
+            writer.write(records)
+            frames += len(records)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames from {len(chunks)} chunks in {elapsed:.2f} s ({frames / max(elapsed, 1e-9):.1f} FPS) "
+          f"-> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
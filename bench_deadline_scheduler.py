@@ -0,0 +1,87 @@
+"""
+Benchmark: DeadlineScheduler against running every stage on every frame.
+
+Both run the new_line_detector_v2 stages (steering, line color, Hough stop
+check, contour path) over synthetic track frames. To mimic slower hardware
+or a stage that spikes, the stop stage sleeps --spike seconds on every
+--spike-every-th run. Reports the per-frame time (what bounds the control
+rate), the frames over budget, and the steering and color accuracy. The
+color may be a few frames stale under the scheduler.
+
+    python bench_deadline_scheduler.py --budget 0.008 --spike 0.02 --spike-every 3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from detection_pipeline import (ContourPathStage, DeadlineScheduler, DetectionPipeline, LineColorStage,
+                                SteeringStage, StopSymbolStage)
+from synthetic_track import generate_dataset
+
+
+class SpikyStage:
+    """Wraps a stage so that every `every`-th run takes `spike` seconds longer."""
+
+    def __init__(self, stage, spike, every):
+        self.stage = stage
+        self.name = stage.name
+        self.spike = spike
+        self.every = every
+        self.calls = 0
+
+    def run(self, ctx):
+        self.calls += 1
+        if self.spike and self.calls % self.every == 0:
+            time.sleep(self.spike)
+        return self.stage.run(ctx)
+
+
+def _sign(value, dead_zone=20):
+    return 0 if abs(value) <= dead_zone else (1 if value > 0 else -1)
+
+
+def measure(process, frames):
+    times, steering, color = [], [], []
+    for frame, truth in frames:
+        start = time.monotonic()
+        results = process(frame, start)
+        times.append(time.monotonic() - start)
+        if truth["bottom_offset"] is not None:
+            steering.append(_sign(results["steering"][4]) == _sign(truth["bottom_offset"]))
+            color.append(results["line_color"] == f"{truth['color']} DETECTED")
+    return np.array(times) * 1000, np.mean(steering), np.mean(color)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--per-scene", type=int, default=5, help="consecutive frames per scene and lighting")
+    parser.add_argument("--budget", type=float, default=0.008, help="seconds per frame for the scheduler")
+    parser.add_argument("--every", type=int, default=5, help="run every secondary stage at least every N frames")
+    parser.add_argument("--spike", type=float, default=0.02, help="extra seconds of a stop stage spike")
+    parser.add_argument("--spike-every", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = list(generate_dataset(args.width, args.height, args.per_scene))
+
+    def stages():
+        # Optional stages in priority order: a missed stop matters more than a stale color
+        return [SteeringStage(), SpikyStage(StopSymbolStage(), args.spike, args.spike_every), LineColorStage(),
+                ContourPathStage()]
+
+    pipeline = DetectionPipeline(stages())
+    required, *optional = stages()
+    scheduler = DeadlineScheduler([required], optional, args.budget, args.every)
+
+    print(f"{'mode':<10} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'over budget':>12} {'steering':>9} {'color':>6}")
+    for name, process in [("all", lambda frame, start: pipeline.process(frame)), ("scheduled", scheduler.process)]:
+        times, steering, color = measure(process, frames)
+        print(f"{name:<10} {np.percentile(times, 50):>7.2f} {np.percentile(times, 99):>7.2f} {times.max():>7.2f} "
+              f"{np.mean(times > args.budget * 1000):>12.0%} {steering:>9.2f} {color:>6.2f}")
+    print(scheduler.report())
+
+
+if __name__ == "__main__":
+    main()
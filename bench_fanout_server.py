@@ -0,0 +1,98 @@
+"""
+Benchmark: fanout_server.py against running the detectors one after another.
+
+The sequential baseline is what three separate servers would spend per
+frame: every detector decodes the JPEG itself (in its decode mode) and then
+detects. The fan-out run starts a FanoutServer on 127.0.0.1, streams the same
+frames with --in-flight frames outstanding (binary replies) and measures
+frames per second from first send to last reply. Scaling with cores needs at
+least one core per worker plus one for ingest.
+
+    python bench_fanout_server.py --frames 300 --in-flight 8
+    python bench_fanout_server.py --detectors line stop --workers line=2
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+
+import cv2
+
+from async_server import DETECTORS
+from fanout_server import FanoutServer, parse_workers
+from frame_decoder import decode_frame
+from script_loader import load_script
+from stream_client import StreamClient
+from synthetic_track import generate_dataset
+
+
+def sequential(detectors, jpegs):
+    """Frames per second of decoding and detecting per detector, one after another."""
+    functions = [(getattr(load_script(script), function), decode_mode)
+                 for script, function, decode_mode, _ in (DETECTORS[d] for d in detectors)]
+    start = time.perf_counter()
+    for jpeg in jpegs:
+        for detect, decode_mode in functions:
+            detect(decode_frame(jpeg, decode_mode))
+    return len(jpegs) / (time.perf_counter() - start)
+
+
+class PreEncodedClient(StreamClient):
+    """Sends already encoded JPEGs, so the client does not compete with the server for the CPU."""
+
+    def encode(self, jpeg):
+        return jpeg
+
+
+def fanout(server, jpegs, in_flight):
+    """Frames per second through a FanoutServer over loopback, every frame answered."""
+    listener = socket.create_server(("127.0.0.1", 0))
+    thread = threading.Thread(target=lambda: server.serve(listener.accept()[0]), daemon=True)
+    thread.start()
+
+    client = PreEncodedClient("127.0.0.1", listener.getsockname()[1], in_flight, binary=True)
+    client.connect()
+    client.send(jpegs[0], block=True)  # Warm up: the workers import their detectors on the first frame
+    client.wait(timeout=60)
+
+    start = time.perf_counter()
+    for jpeg in jpegs:
+        client.send(jpeg, block=True)
+    client.wait(timeout=60)
+    elapsed = time.perf_counter() - start
+    client.close()
+    thread.join(timeout=10)
+    listener.close()
+    return len(jpegs) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detectors", nargs="+", choices=sorted(DETECTORS), default=["line", "stop", "percentage"])
+    parser.add_argument("--workers", nargs="*", metavar="DETECTOR=N", help="processes per detector (default 1)")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--in-flight", type=int, default=8)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    dataset = [frame for frame, _ in generate_dataset(args.width, args.height, per_scene=2)]
+    frames = [dataset[i % len(dataset)] for i in range(args.frames)]
+    jpegs = [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for frame in frames]
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+    print(f"{len(cores or [])} cores available, detectors: {' '.join(args.detectors)}")
+    print(f"sequential (decode per detector): {sequential(args.detectors, jpegs):8.1f} fps")
+
+    server = FanoutServer(args.detectors, parse_workers(args.workers), cores, args.in_flight,
+                          args.width, args.height, binary=True)
+    try:
+        print(f"fan-out (decode once, shared ring): {fanout(server, jpegs, args.in_flight):6.1f} fps")
+        print(server.report())
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
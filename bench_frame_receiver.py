@@ -0,0 +1,78 @@
+"""
+Microbenchmark: FrameReceiver against the original `data += conn.recv(4096)` loop.
+
+Sends length-prefixed dummy JPEG payloads over a local socket pair and reports
+throughput (MB/s) and per-frame overhead for each receiver.
+
+    python bench_frame_receiver.py --frames 300 --sizes 50000 200000 600000
+"""
+import argparse
+import socket
+import struct
+import threading
+import time
+
+from frame_receiver import FrameReceiver
+
+
+def legacy_receive(conn, count):
+    """The receive loop used by the servers before FrameReceiver."""
+    data = b""
+    payload_size = struct.calcsize("Q")
+    for _ in range(count):
+        while len(data) < payload_size:
+            data += conn.recv(4096)
+        msg_size = struct.unpack("Q", data[:payload_size])[0]
+        data = data[payload_size:]
+        while len(data) < msg_size:
+            data += conn.recv(4096)
+        frame_data = data[:msg_size]
+        data = data[msg_size:]
+    return frame_data
+
+
+def framed_receive(conn, count):
+    receiver = FrameReceiver(conn)
+    for _ in range(count):
+        frame_data = receiver.receive()
+    return frame_data
+
+
+def send_frames(conn, payload, count):
+    message = struct.pack("Q", len(payload)) + payload
+    for _ in range(count):
+        conn.sendall(message)
+
+
+def run(receive, payload, count):
+    """Returns the elapsed seconds for receiving count frames of payload."""
+    server, client = socket.socketpair()
+    sender = threading.Thread(target=send_frames, args=(client, payload, count))
+    start = time.perf_counter()
+    sender.start()
+    last = receive(server, count)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    server.close()
+    client.close()
+    assert bytes(last) == payload
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300, help="frames per run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 200_000, 600_000], help="payload sizes in bytes")
+    args = parser.parse_args()
+
+    print(f"{'receiver':<10} {'size':>9} {'MB/s':>9} {'us/frame':>10}")
+    for size in args.sizes:
+        payload = bytes(range(256)) * (size // 256) + bytes(size % 256)
+        for name, receive in (("legacy", legacy_receive), ("framed", framed_receive)):
+            elapsed = run(receive, payload, args.frames)
+            mb_per_s = size * args.frames / elapsed / 1e6
+            print(f"{name:<10} {size:>9} {mb_per_s:>9.1f} {elapsed / args.frames * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Microbenchmark: ROIEngine against per-ROI masks and countNonZero.
+
+For grids of increasing size over the lower half of a frame, reports the time
+to get black/red/green/blue percentages of every cell with the approach of
+detect_colors (full-frame HSV, inRange masks, one countNonZero per cell and
+class) and with ROIEngine (HSV and integral images of the crop only).
+
+    python bench_roi_engine.py --width 640 --height 480 --grids 2x2 4x8 16x32
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from color_classifier import HSVColorClassifier
+from roi_engine import ROIEngine
+from synthetic_track import generate_frame
+
+COLORS = HSVColorClassifier({
+    "red": [(160, 100, 100), (10, 255, 255)],
+    "green": [(40, 40, 40), (90, 255, 255)],
+    "blue": [(90, 50, 50), (140, 255, 255)],
+})
+
+
+def per_roi_occupancy(frame, rois, threshold=50):
+    """The detect_colors approach, generalized to any list of ROIs."""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    _, black_mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+    masks = [black_mask,
+             cv2.inRange(hsv, (0, 100, 100), (10, 255, 255)) + cv2.inRange(hsv, (160, 100, 100), (180, 255, 255)),
+             cv2.inRange(hsv, (40, 40, 40), (90, 255, 255)),
+             cv2.inRange(hsv, (90, 50, 50), (140, 255, 255))]
+    results = []
+    for (y1, y2, x1, x2) in rois:
+        total_pixels = (y2 - y1) * (x2 - x1)
+        results.append([cv2.countNonZero(mask[y1:y2, x1:x2]) / total_pixels * 100 for mask in masks])
+    return np.array(results)
+
+
+def engine_occupancy(frame, engine, threshold=50):
+    gray = cv2.cvtColor(engine.crop(frame), cv2.COLOR_BGR2GRAY)
+    _, crop_mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+    colors = engine.color_occupancy(frame, COLORS)
+    return np.column_stack([engine.occupancy(crop_mask, cropped=True)] + [colors[c] for c in COLORS.colors])
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--grids", nargs="+", default=["2x2", "4x8", "8x16", "16x32"], help="ROWSxCOLS")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    frame, _ = generate_frame("red", "noise", args.width, args.height)
+
+    print(f"{'grid':>6} {'ROIs':>5} {'per-ROI ms':>11} {'engine ms':>10} {'max diff %':>11}")
+    for grid in args.grids:
+        rows, cols = map(int, grid.split("x"))
+        engine = ROIEngine.grid(frame.shape, rows, cols, region=(0.1, 0.5, 0.9, 0.95), gap=(0.01, 0.01))
+        legacy_time, legacy = timed(lambda: per_roi_occupancy(frame, engine.rois), args.repeat)
+        engine_time, result = timed(lambda: engine_occupancy(frame, engine), args.repeat)
+        print(f"{grid:>6} {len(engine.rois):>5} {legacy_time * 1000:>11.3f} {engine_time * 1000:>10.3f} "
+              f"{np.abs(legacy - result).max():>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
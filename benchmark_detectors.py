@@ -0,0 +1,236 @@
+"""
+Benchmark and accuracy suite for all detector variants on synthetic track frames.
+
+For every variant and resolution it reports frames/s, p50/p99 latency of the
+decode and detect stages, Python/numpy memory allocated per frame and decision
+accuracy against the generator's ground truth. Results are saved as JSON; pass
+--baseline with an earlier file to print regressions.
+
+    python benchmark_detectors.py --output bench.json
+    python benchmark_detectors.py --output new.json --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from auto_calibration import AutoCalibrator
+from detection_pipeline import DetectionPipeline
+from frame_decoder import decode_frame
+from projection_stop_detector import detect_stop_bars
+from scaled_detection import ScaledLineDetector, detect_stop_symbol_scaled
+from script_loader import load_script
+from synthetic_track import generate_dataset
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]
+
+
+def _sign(value, dead_zone=20):
+    return 0 if abs(value) <= dead_zone else (1 if value > 0 else -1)
+
+
+def score_line(result, truth):
+    """deviation_value side (left/center/right) and line color against the ground truth."""
+    scores = {}
+    if truth["bottom_offset"] is not None:
+        scores["line"] = _sign(result[5]) == _sign(truth["bottom_offset"])
+        scores["color"] = result[6] == f"{truth['color']} DETECTED"
+    return scores
+
+
+def score_stop(result, truth):
+    return {"stop": (result == "STOP") == truth["stop_bars"]}
+
+
+def score_stop_bars(result, truth):
+    return score_stop(result[0], truth)
+
+
+def score_grid(result, truth):
+    return {"grid": result[0] == truth["grid"]}
+
+
+def score_grid_stop(result, truth):
+    return {"grid": (result[0] == "STOP") == (truth["grid"] == "STOP")}
+
+
+def score_pipeline(result, truth):
+    scores = score_line(result["line"], truth)
+    scores.update(score_stop(result["stop"], truth))
+    scores.update(score_grid(result["percentage"], truth))
+    return scores
+
+
+def calibrated(detect, calibration):
+    """detect(frame, threshold[, color_classifier]) fed by a calibration that follows the frame stream."""
+    def detect_calibrated(frame):
+        calibration.update(frame)
+        if calibration.colors:
+            return detect(frame, calibration.threshold, color_classifier=calibration.classifier)
+        return detect(frame, calibration.threshold)
+    return detect_calibrated
+
+
+def variants():
+    """name -> (detect(frame), score(result, truth)[, decode mode]); the decode mode defaults to "color"."""
+    class_module = load_script("black line detector with stop prototype.py")
+    line_detector = class_module.BlackLineDetector()
+    stop_detector = class_module.StopSymbolDetector()
+    pipeline = DetectionPipeline()
+    v2 = load_script("new_line_detector_v2")
+    scaled = ScaledLineDetector(0.5, color_classifier=v2.adaptive_color_classifier)
+    coarse_to_fine = ScaledLineDetector(0.25, refine=True, color_classifier=v2.adaptive_color_classifier)
+    ras = load_script("stop_detector_with_camera_ras")
+    percentage = load_script("percentage_stopper.py")
+
+    return {
+        "base_code": (load_script("base code.py").detect_black_line_and_color, score_line),
+        "new_line_detector_v2": (v2.detect_black_line_and_color, score_line),
+        "v2_auto_calibrated": (calibrated(v2.detect_black_line_and_color, AutoCalibrator(v2.COLOR_RANGES)), score_line),
+        "v2_scaled_0.5": (scaled.detect, score_line),
+        "v2_coarse_to_fine_0.25": (coarse_to_fine.detect, score_line),
+        "BlackLineDetector": (line_detector.detect_black_line_and_color, score_line),
+        "StopSymbolDetector": (stop_detector.detect_stop_symbol, score_stop),
+        "stop_detector_prototype": (load_script("stop detector_prototype.py").detect_stop_symbol, score_stop),
+        "stop_detector_with_camera_ras": (ras.detect_stop_symbol, score_stop),
+        "stop_scaled_0.5": (lambda frame: detect_stop_symbol_scaled(frame, 0.5), score_stop),
+        "stop_projection": (detect_stop_bars, score_stop_bars),
+        "stop_projection_gray": (detect_stop_bars, score_stop_bars, "gray"),
+        "stop_ras_gray": (ras.detect_stop_symbol, score_stop, "gray"),
+        "percentage_stopper_gray": (percentage.detect_horizontal_lines, score_grid, "gray"),
+        "percentage_stopper_reduced_2": (percentage.detect_horizontal_lines, score_grid, "reduced_2"),
+        "percentage_stopper": (percentage.detect_horizontal_lines, score_grid),
+        "percentage_stopper_auto_calibrated": (calibrated(percentage.detect_horizontal_lines, AutoCalibrator(threshold=50)),
+                                               score_grid),
+        "percentage_with_color": (load_script("percentage with color.py").detect_colors, score_grid_stop),
+        "pipeline_all": (pipeline.process, score_pipeline),
+    }
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {"p50_ms": float(np.percentile(samples, 50)), "p99_ms": float(np.percentile(samples, 99))}
+
+
+def bench_variant(detect, score, frames, jpegs, repeat, memory_frames, decode_mode="color"):
+    decode_times, detect_times = [], []
+    correct, total = {}, {}
+
+    # Some prototypes print their decisions; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for (frame, truth), jpeg in zip(frames, jpegs):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                decoded = decode_frame(jpeg, decode_mode)
+                decoded_at = time.perf_counter()
+                result = detect(decoded)
+                detect_times.append(time.perf_counter() - decoded_at)
+                decode_times.append(decoded_at - start)
+
+            for task, ok in score(result, truth).items():
+                correct[task] = correct.get(task, 0) + int(ok)
+                total[task] = total.get(task, 0) + 1
+
+        # Peak memory allocated (numpy and Python objects) while detecting one frame
+        peaks = []
+        for (frame, _), jpeg in list(zip(frames, jpegs))[:memory_frames]:
+            decoded = decode_frame(jpeg, decode_mode)
+            tracemalloc.start()
+            detect(decoded)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    total_time = sum(decode_times) + sum(detect_times)
+    return {
+        "fps": len(detect_times) / total_time,
+        "detect_fps": len(detect_times) / sum(detect_times),
+        "decode": percentiles(decode_times),
+        "detect": percentiles(detect_times),
+        "alloc_bytes_per_frame": int(np.mean(peaks)) if peaks else 0,
+        "accuracy": {task: correct[task] / total[task] for task in total},
+        "samples": {task: total[task] for task in total},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Prints variants whose FPS or accuracy dropped by more than tolerance against baseline."""
+    old = {(r["variant"], r["resolution"]): r for r in baseline["results"]}
+    regressions = 0
+    for r in results:
+        before = old.get((r["variant"], r["resolution"]))
+        if before is None:
+            continue
+        if r["fps"] < before["fps"] * (1 - tolerance):
+            print(f"REGRESSION {r['variant']} {r['resolution']}: fps {before['fps']:.1f} -> {r['fps']:.1f}")
+            regressions += 1
+        for task, accuracy in r["accuracy"].items():
+            if accuracy < before["accuracy"].get(task, 0) - tolerance:
+                print(f"REGRESSION {r['variant']} {r['resolution']}: {task} accuracy "
+                      f"{before['accuracy'][task]:.2f} -> {accuracy:.2f}")
+                regressions += 1
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative FPS / absolute accuracy drop")
+    parser.add_argument("--variants", nargs="+", help="only run these variants")
+    parser.add_argument("--resolutions", nargs="+", default=[f"{w}x{h}" for w, h in RESOLUTIONS])
+    parser.add_argument("--per-scene", type=int, default=2, help="frames per scene and lighting condition")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per frame")
+    parser.add_argument("--memory-frames", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    all_variants = variants()
+    selected = args.variants or list(all_variants)
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = map(int, resolution.split("x"))
+        frames = list(generate_dataset(width, height, args.per_scene, args.seed))
+        jpegs = [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1] for frame, _ in frames]
+
+        for name in selected:
+            detect, score, *decode_mode = all_variants[name]
+            result = bench_variant(detect, score, frames, jpegs, args.repeat, args.memory_frames, *decode_mode)
+            result.update(variant=name, resolution=resolution)
+            results.append(result)
+
+            accuracy = " ".join(f"{task}={value:.2f}" for task, value in result["accuracy"].items())
+            print(f"{name:<30} {resolution:>9} {result['fps']:>8.1f} fps  "
+                  f"detect p50 {result['detect']['p50_ms']:.2f} ms p99 {result['detect']['p99_ms']:.2f} ms  "
+                  f"{result['alloc_bytes_per_frame'] / 1024:.0f} KiB  {accuracy}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "per_scene": args.per_scene,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
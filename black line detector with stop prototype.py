@@ -1,13 +1,28 @@
 import cv2
 import numpy as np
 
+from color_classifier import HSVColorClassifier
+from section_centroids import compute_section_centroids
+
 class BlackLineDetector:
-    def __init__(self, threshold=60):
+    def __init__(self, threshold=60, num_sections=4):
         self.threshold = threshold
+        self.num_sections = num_sections
+        self.color_classifier = HSVColorClassifier({
+            "BLACK": [(0, 0, 0), (180, 255, 50)],
+            "RED": [(0, 120, 70), (10, 255, 255)],
+            "GREEN": [(35, 40, 40), (85, 255, 255)],
+            "BLUE": [(90, 50, 70), (128, 255, 255)]
+        })
     
-    def detect_black_line_and_color(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
+    def detect_black_line_and_color(self, frame, mask=None, hsv=None):
+        """
+        Detects the line, its direction and color. A precomputed threshold mask
+        and full-frame HSV image can be passed in to skip those conversions.
+        """
+        if mask is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         deviations = []
@@ -22,51 +37,22 @@ class BlackLineDetector:
             epsilon = 0.005 * cv2.arcLength(largest_contour, True)
             contour_path = cv2.approxPolyDP(largest_contour, epsilon, True)
 
-            line_mask = np.zeros_like(mask)
-            cv2.drawContours(line_mask, [largest_contour], -1, 255, thickness=cv2.FILLED)
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-            color_ranges = {
-                "BLACK": [(0, 0, 0), (180, 255, 50)],
-                "RED": [(0, 120, 70), (10, 255, 255)],
-                "GREEN": [(35, 40, 40), (85, 255, 255)],
-                "BLUE": [(90, 50, 70), (128, 255, 255)]
-            }
-
-            for color, (lower, upper) in color_ranges.items():
-                color_mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
-                color_mask = cv2.bitwise_and(color_mask, color_mask, mask=line_mask)
+            x, y, w, h = cv2.boundingRect(largest_contour)
+            line_mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.drawContours(line_mask, [largest_contour], -1, 255, thickness=cv2.FILLED, offset=(-x, -y))
+            if hsv is None:
+                line_hsv = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2HSV)
+            else:
+                line_hsv = hsv[y:y + h, x:x + w]
 
-                if cv2.countNonZero(color_mask) > 500:
-                    line_color = f"{color} DETECTED"
-                    break
+            color_counts = self.color_classifier.count(line_hsv, line_mask)
+            color = self.color_classifier.first_detected(color_counts, 500)
+            if color:
+                line_color = f"{color} DETECTED"
 
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            section_height = h // 4
             frame_center = frame.shape[1] // 2
-            top_dot = None
-
-            for i in range(4):
-                section_y = int(y + (i + 0.5) * section_height)
-                middle_points.append((frame_center, section_y))
-                
-                section_mask = np.zeros_like(mask)
-                section_mask[max(0, section_y - section_height // 2):section_y + section_height // 2, :] = mask[
-                    max(0, section_y - section_height // 2):section_y + section_height // 2, :]
-                
-                section_contours, _ = cv2.findContours(section_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                if section_contours:
-                    section_largest = max(section_contours, key=cv2.contourArea)
-                    M = cv2.moments(section_largest)
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        deviation = cx - frame_center
-                        deviations.append((cx, cy, deviation))
-                        
-                        if i == 0:
-                            top_dot = (cx, cy)
+            deviations, middle_points, top_dot = compute_section_centroids(
+                mask, (x, y, w, h), frame_center, self.num_sections)
 
             if deviations:
                 deviation_value = deviations[-1][2]
@@ -93,9 +79,11 @@ class BlackLineDetector:
         return mask, deviations, middle_points, contour_path, direction, deviation_value, line_color
 
 class StopSymbolDetector(BlackLineDetector):
-    def detect_stop_symbol(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 50, 150)
+    def detect_stop_symbol(self, frame, edges=None):
+        """Detects two close horizontal lines. Precomputed Canny(gray, 50, 150) edges can be passed in."""
+        if edges is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            edges = cv2.Canny(gray, 50, 150)
         lines = cv2.HoughLinesP(edges, 1, np.pi / 180, threshold=50, minLineLength=50, maxLineGap=10)
         
         horizontal_lines = []
@@ -124,8 +112,12 @@ if __name__ == "__main__":
         if not ret:
             break
         
-        mask, deviations, middle_points, contour_path, direction, deviation_value, line_color = detector.detect_black_line_and_color(frame)
-        stop_status = detector.detect_stop_symbol(frame)
+        # Convert to gray once and share it between both detectors
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, detector.threshold, 255, cv2.THRESH_BINARY_INV)
+
+        mask, deviations, middle_points, contour_path, direction, deviation_value, line_color = detector.detect_black_line_and_color(frame, mask=mask)
+        stop_status = detector.detect_stop_symbol(frame, edges=cv2.Canny(gray, 50, 150))
         
         cv2.putText(frame, f"Direction: {direction}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
         cv2.putText(frame, f"Deviation: {deviation_value}", (50, 90), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
@@ -0,0 +1,61 @@
+import numpy as np
+
+MAX_COLORS = 16
+
+
+class HSVColorClassifier:
+    """
+    Classifies HSV pixels against a whole color table in a single pass.
+
+    The table is compiled once into three 256-entry lookup tables (one per
+    H, S, V channel) where bit i is set if the value is inside the range of
+    color i. ANDing the three lookups gives a packed label per pixel, and one
+    bincount over the labels gives the pixel count of every color at once.
+
+    A hue range whose lower bound is greater than its upper bound wraps
+    around 180, e.g. "RED": [(170, 120, 70), (10, 255, 255)].
+    """
+
+    def __init__(self, color_ranges):
+        if len(color_ranges) > MAX_COLORS:
+            raise ValueError(f"At most {MAX_COLORS} colors are supported, got {len(color_ranges)}")
+
+        self.colors = list(color_ranges)
+        self.lut_h = np.zeros(256, dtype=np.uint16)
+        self.lut_s = np.zeros(256, dtype=np.uint16)
+        self.lut_v = np.zeros(256, dtype=np.uint16)
+
+        for i, (lower, upper) in enumerate(color_ranges.values()):
+            bit = np.uint16(1 << i)
+            (h_lo, s_lo, v_lo), (h_hi, s_hi, v_hi) = [[int(c) for c in bound] for bound in (lower, upper)]
+
+            if h_lo <= h_hi:
+                self.lut_h[h_lo:h_hi + 1] |= bit
+            else:  # Hue wraps around (red)
+                self.lut_h[h_lo:] |= bit
+                self.lut_h[:h_hi + 1] |= bit
+            self.lut_s[s_lo:s_hi + 1] |= bit
+            self.lut_v[v_lo:v_hi + 1] |= bit
+
+        # Row j holds the bits of label j, so bincount(labels) @ bit_table gives per-color counts
+        labels = np.arange(1 << len(self.colors))
+        self.bit_table = (labels[:, None] >> np.arange(len(self.colors))) & 1
+
+    def label(self, hsv, mask=None):
+        """Returns the packed color label of every pixel (or of the pixels inside mask)."""
+        pixels = hsv[mask != 0] if mask is not None else hsv.reshape(-1, 3)
+        return self.lut_h[pixels[:, 0]] & self.lut_s[pixels[:, 1]] & self.lut_v[pixels[:, 2]]
+
+    def count(self, hsv, mask=None):
+        """Returns {color: pixel count} for every color in the table."""
+        labels = self.label(hsv, mask)
+        histogram = np.bincount(labels, minlength=len(self.bit_table))
+        counts = histogram @ self.bit_table
+        return dict(zip(self.colors, counts.tolist()))
+
+    def first_detected(self, counts, min_pixels=500):
+        """Returns the first color in table order with more than min_pixels pixels, or None."""
+        for color in self.colors:
+            if counts[color] > min_pixels:
+                return color
+        return None
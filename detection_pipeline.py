@@ -0,0 +1,273 @@
+import time
+
+import cv2
+
+from projection_stop_detector import detect_stop_bars
+from script_loader import load_script
+
+
+class FrameContext:
+    """
+    Shared per-frame preprocessing. Gray, HSV, threshold masks and edge maps
+    are computed on first use and cached, so every stage reuses them.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.cache = {}
+
+    def has(self, key):
+        return key in self.cache
+
+    @property
+    def gray(self):
+        if "gray" not in self.cache:
+            self.cache["gray"] = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self.cache["gray"]
+
+    @property
+    def hsv(self):
+        if "hsv" not in self.cache:
+            self.cache["hsv"] = cv2.cvtColor(self.frame, cv2.COLOR_BGR2HSV)
+        return self.cache["hsv"]
+
+    def mask(self, threshold):
+        """Inverted binary threshold of the gray image (black line -> 255)."""
+        key = ("mask", threshold)
+        if key not in self.cache:
+            _, self.cache[key] = cv2.threshold(self.gray, threshold, 255, cv2.THRESH_BINARY_INV)
+        return self.cache[key]
+
+    def edges(self, low=50, high=150, blur=None):
+        """Canny edges of the gray image, optionally after a blur x blur Gaussian blur."""
+        key = ("edges", low, high, blur)
+        if key not in self.cache:
+            gray = self.gray if blur is None else cv2.GaussianBlur(self.gray, (blur, blur), 0)
+            self.cache[key] = cv2.Canny(gray, low, high)
+        return self.cache[key]
+
+
+class ColorStage:
+    """Black/red/green/blue percentages in the four ROIs (detect_colors)."""
+    name = "color"
+
+    def __init__(self, threshold=50, area_threshold=65):
+        self.detect_colors = load_script("percentage with color.py").detect_colors
+        self.threshold = threshold
+        self.area_threshold = area_threshold
+
+    def run(self, ctx):
+        return self.detect_colors(ctx.frame, self.threshold, self.area_threshold,
+                                  hsv=ctx.hsv, black_mask=ctx.mask(self.threshold))
+
+
+class LineStage:
+    """Line direction, deviation and color (BlackLineDetector)."""
+    name = "line"
+
+    def __init__(self, threshold=60, num_sections=4):
+        module = load_script("black line detector with stop prototype.py")
+        self.detector = module.BlackLineDetector(threshold, num_sections)
+
+    def run(self, ctx):
+        # Only reuse HSV if another stage already paid for it; otherwise the detector converts the line's box only
+        hsv = ctx.hsv if ctx.has("hsv") else None
+        return self.detector.detect_black_line_and_color(ctx.frame, mask=ctx.mask(self.detector.threshold), hsv=hsv)
+
+
+class StopSymbolStage:
+    """Double horizontal bar stop symbol (StopSymbolDetector)."""
+    name = "stop"
+
+    def __init__(self):
+        self.detector = load_script("black line detector with stop prototype.py").StopSymbolDetector()
+
+    def run(self, ctx):
+        return self.detector.detect_stop_symbol(ctx.frame, edges=ctx.edges(50, 150))
+
+
+class StopBarsStage:
+    """Double-bar stop symbol from the row projection profile (detect_stop_bars): (status, bars, confidence)."""
+    name = "stop_bars"
+
+    def __init__(self, threshold=60, band=(0.25, 1.0)):
+        self.threshold = threshold
+        self.band = band
+
+    def run(self, ctx):
+        return detect_stop_bars(ctx.frame, self.threshold, self.band, mask=ctx.mask(self.threshold))
+
+
+class PercentageStage:
+    """STOP / PAST_LINE / FORWARD from black percentages in the 2x2 grid (detect_horizontal_lines)."""
+    name = "percentage"
+
+    def __init__(self, threshold=50, area_threshold=65):
+        self.detect_horizontal_lines = load_script("percentage_stopper.py").detect_horizontal_lines
+        self.threshold = threshold
+        self.area_threshold = area_threshold
+
+    def run(self, ctx):
+        return self.detect_horizontal_lines(ctx.frame, self.threshold, self.area_threshold,
+                                            mask=ctx.mask(self.threshold))
+
+
+class SteeringStage:
+    """
+    Line direction and deviation only (new_line_detector_v2 without color and
+    contour path): (mask, deviations, middle_points, direction, deviation_value).
+    Leaves the line contour in ctx.cache["line_contour"] for the stages below.
+    """
+    name = "steering"
+
+    def __init__(self, threshold=60, num_sections=4):
+        self.v2 = load_script("new_line_detector_v2")
+        self.threshold = threshold
+        self.num_sections = num_sections
+
+    def run(self, ctx):
+        mask = ctx.mask(self.threshold)
+        contour = ctx.cache["line_contour"] = self.v2.largest_line_contour(mask)
+        if contour is None:
+            return mask, [], [], "STOP", 0
+        frame_center = ctx.frame.shape[1] // 2
+        return (mask,) + self.v2.steer(mask, cv2.boundingRect(contour), frame_center, self.num_sections)
+
+
+class LineColorStage:
+    """Color of the steering stage's line contour ("RED DETECTED", ..., "NO COLOR")."""
+    name = "line_color"
+    needs = "line_contour"
+    empty = "NO COLOR"  # Result without a line contour
+
+    def __init__(self, color_classifier=None):
+        self.v2 = load_script("new_line_detector_v2")
+        self.color_classifier = color_classifier  # None: new_line_detector_v2.adaptive_color_classifier
+
+    def run(self, ctx):
+        contour = ctx.cache.get("line_contour")
+        if contour is None:
+            return "NO COLOR"
+        return self.v2.classify_line_color(ctx.frame, contour, self.color_classifier)
+
+
+class ContourPathStage:
+    """Smoothed outline of the steering stage's line contour, for display only."""
+    name = "contour_path"
+    needs = "line_contour"
+    empty = None
+
+    def __init__(self):
+        self.v2 = load_script("new_line_detector_v2")
+
+    def run(self, ctx):
+        contour = ctx.cache.get("line_contour")
+        return None if contour is None else self.v2.smooth_contour(contour)
+
+
+class DetectionPipeline:
+    """
+    Runs several detectors as stages over one shared FrameContext and returns
+    a combined {stage name: result} dict.
+
+    Example:
+        pipeline = DetectionPipeline()
+        results = pipeline.process(frame)
+        direction = results["line"][4]
+    """
+
+    def __init__(self, stages=None):
+        # Color runs first so the line stage can reuse its full-frame HSV
+        self.stages = stages if stages is not None else [ColorStage(), LineStage(), StopSymbolStage(), PercentageStage()]
+
+    def process(self, frame):
+        ctx = FrameContext(frame)
+        return {stage.name: stage.run(ctx) for stage in self.stages}
+
+
+class DeadlineScheduler:
+    """
+    Runs the required stages on every frame and the optional ones only while
+    the frame's time budget allows, so a slow stage cannot stretch the loop.
+
+    The required stages run first, in order. Then each optional stage, in
+    order of priority, runs if its expected cost (moving average of its run
+    times, weight alpha) fits into what is left of `budget` seconds since the
+    frame started, or if it was skipped on the last every - 1 frames. When a
+    stage is skipped its last result is reused, so process() always returns
+    every stage. `every` is a number or a {stage name: number} dict; None
+    (or a missing name) leaves the stage to the budget alone.
+
+    A stage with a `needs` attribute (a ctx.cache key set by a required
+    stage) is not run when that entry is None: its result is set to the
+    stage's `empty` value instead, since the last result would describe a
+    line that is no longer in view. This does not count as a run, and does
+    not pull down the stage's expected cost.
+
+    Example:
+        scheduler = DeadlineScheduler([SteeringStage()], [StopSymbolStage(), LineColorStage(), ContourPathStage()],
+                                      budget=0.010, every=5)
+        results = scheduler.process(frame, started=received_at)
+        direction = results["steering"][3]
+    """
+
+    def __init__(self, required, optional, budget=0.010, every=5, alpha=0.2):
+        self.required = required
+        self.optional = optional
+        self.budget = budget
+        self.every = every
+        self.alpha = alpha
+        self.costs = {}  # Stage name -> average run time in seconds
+        self.results = {}  # Last result of every stage
+        self.ages = {stage.name: 0 for stage in optional}  # Frames since each optional stage last ran
+        self.fresh = set()  # Stages whose result is from the last frame
+        self.runs = {stage.name: 0 for stage in required + optional}
+        self.frames = 0
+        self.overruns = 0  # Frames that finished past the budget
+
+    def _due(self, stage):
+        """True if the stage has no result yet or its result is every - 1 frames old."""
+        every = self.every.get(stage.name) if isinstance(self.every, dict) else self.every
+        return stage.name not in self.results or every is not None and self.ages[stage.name] + 1 >= every
+
+    def _run(self, stage, ctx):
+        start = time.monotonic()
+        self.results[stage.name] = stage.run(ctx)
+        cost = time.monotonic() - start
+        previous = self.costs.get(stage.name)
+        self.costs[stage.name] = cost if previous is None else previous + self.alpha * (cost - previous)
+        self.runs[stage.name] += 1
+        self.fresh.add(stage.name)
+
+    def process(self, frame, started=None):
+        """started: time.monotonic() when the frame arrived (default now), so decoding counts against the budget."""
+        started = time.monotonic() if started is None else started
+        deadline = started + self.budget
+        ctx = FrameContext(frame)
+        self.fresh = set()
+        self.frames += 1
+
+        for stage in self.required:
+            self._run(stage, ctx)
+
+        for stage in self.optional:
+            needs = getattr(stage, "needs", None)
+            if needs is not None and ctx.cache.get(needs) is None:
+                self.results[stage.name] = stage.empty
+                self.fresh.add(stage.name)
+                self.ages[stage.name] = 0
+            elif self._due(stage) or time.monotonic() + self.costs.get(stage.name, 0.0) <= deadline:
+                self._run(stage, ctx)
+                self.ages[stage.name] = 0
+            else:
+                self.ages[stage.name] += 1
+
+        if time.monotonic() > deadline:
+            self.overruns += 1
+        return dict(self.results)
+
+    def report(self):
+        """One-line summary of how often each stage ran and its average cost."""
+        stages = ", ".join(f"{name} {self.runs[name] / max(self.frames, 1):.0%} "
+                           f"{self.costs.get(name, 0.0) * 1000:.2f} ms" for name in self.runs)
+        return f"{self.frames} frames, {self.overruns} over budget; {stages}"
@@ -0,0 +1,310 @@
+"""
+Runs several detectors on one stream: decode once, detect in parallel processes.
+
+The single-robot servers each bind port 8080 and decode the stream
+themselves, so the line follower, the stop detector and the percentage
+stopper cannot run side by side. Here one ingest process receives every frame
+(same protocol: 8-byte "Q" length + JPEG or raw Y plane), decodes it once
+into a shared-memory FrameRing slot (BGR, plus gray if a detector wants gray)
+and hands the slot index to one worker process per detector. Workers are
+pinned to their own cores where possible and read the frame from shared
+memory without copying. A combiner thread merges their reply fields into one
+reply per frame, in frame order, and then frees the slot.
+
+Combined reply: the line decision, deviation and color; stop_state is STOP
+if any detector sees a stop (the stop symbol or a full 2x2 grid), else
+PAST_LINE or CONTINUE; and the decision becomes STOP when stop_state is.
+A frame that cannot be decoded, is larger than the ring or makes a detector
+raise is answered with STOP and stop_state UNKNOWN (async_server.ERROR_FIELDS).
+
+    python fanout_server.py --detectors line stop percentage --binary
+    python fanout_server.py --detectors line stop --workers line=2 --slots 8
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+
+import cv2
+
+from async_server import DETECTORS, ERROR_FIELDS
+from frame_decoder import decode_frame
+from frame_receiver import FrameReceiver
+from reply_protocol import encode_reply
+from script_loader import load_script
+from shared_frame_ring import FrameRing
+
+STOP_PRIORITY = ["CONTINUE", "PAST_LINE", "STOP"]
+
+
+def combine_fields(fields_by_detector):
+    """Merges the encode_reply fields of several detectors into one reply."""
+    line = fields_by_detector.get("line", {})
+    stop_state = "CONTINUE"
+    for detector, fields in fields_by_detector.items():
+        # The stop detector only reports a decision; the grid reports a stop_state
+        state = fields.get("stop_state") or (fields["decision"] if detector != "line" else None)
+        if state in STOP_PRIORITY and STOP_PRIORITY.index(state) > STOP_PRIORITY.index(stop_state):
+            stop_state = state
+
+    decision = line.get("decision") or next(iter(fields_by_detector.values()))["decision"]
+    if stop_state == "STOP":
+        decision = "STOP"
+    return {"decision": decision, "deviation_value": line.get("deviation_value", 0),
+            "line_color": line.get("line_color", "NO COLOR"), "stop_state": stop_state}
+
+
+def detector_worker(detector, ring_args, core, tasks, results):
+    """
+    Worker process: runs one detector on ring slots until it gets None.
+    Puts (connection, seq, detector, fields, seconds) on results for every
+    task; fields is None if the detector raised.
+    """
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    cv2.setNumThreads(1)  # One core per worker; the parallelism comes from the processes
+
+    script, function, decode_mode, fields_of = DETECTORS[detector]
+    detect = getattr(load_script(script), function)
+    ring = FrameRing(**ring_args)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            connection, seq, slot = task
+            _, frame = ring.read(slot, gray=decode_mode == "gray")
+            start = time.thread_time()  # CPU time: wall time would include other workers sharing the core
+            try:
+                fields = fields_of(detect(frame))
+            except Exception as error:
+                # Still report the frame, or its reply and its slot would wait forever
+                print(f"{detector} failed on frame {seq}: {error!r}")
+                fields = None
+            elapsed = time.thread_time() - start
+            del frame  # The view must not outlive the ring mapping
+            results.put((connection, seq, detector, fields, elapsed))
+    finally:
+        ring.close()
+
+
+class FanoutServer:
+    """
+    workers: {detector: processes}; detectors with more than one process take
+    frames in turn. cores: CPU ids to pin workers to, assigned round-robin
+    after the first one, which is left to the ingest process (None: no pinning).
+    """
+
+    def __init__(self, detectors=("line", "stop", "percentage"), workers=None, cores=None, slots=8,
+                 max_width=1280, max_height=720, binary=False, history=1000):
+        self.detectors = list(detectors)
+        self.binary = binary
+        self.decode_mode = "gray" if all(DETECTORS[d][2] == "gray" for d in self.detectors) else "color"
+        self.needs_gray = any(DETECTORS[d][2] == "gray" for d in self.detectors)
+        self.ring = FrameRing(slots, max_width, max_height)
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.connection = 0  # Tags tasks and results, so late results never reach the next connection
+        self.orphans = {}  # (connection, seq) -> [slot, results still expected] of frames a connection gave up on
+        ring_args = {"slots": slots, "max_width": max_width, "max_height": max_height, "name": self.ring.name}
+
+        context = multiprocessing.get_context("spawn")  # Fresh interpreters: no inherited OpenCV threads or sockets
+        self.results = context.Queue()
+        self.tasks = {detector: context.Queue() for detector in self.detectors}
+        self.processes = []
+        counts = workers or {}
+        for detector in self.detectors:
+            for _ in range(counts.get(detector, 1)):
+                core = None
+                if cores:
+                    core = cores[(len(self.processes) + 1) % len(cores)]
+                process = context.Process(target=detector_worker, daemon=True,
+                                          args=(detector, ring_args, core, self.tasks[detector], self.results))
+                process.start()
+                self.processes.append((detector, process))
+
+        self.detect_times = {detector: collections.deque(maxlen=history) for detector in self.detectors}
+        self.latencies = collections.deque(maxlen=history)
+        self.frames = 0
+
+    def _settle_orphan(self, connection, seq):
+        """A late result of a previous connection: frees the frame's slot once its last result is in."""
+        orphan = self.orphans.get((connection, seq))
+        if orphan is None:
+            return
+        orphan[1] -= 1
+        if orphan[1] == 0:
+            self.free_slots.put(orphan[0])
+            del self.orphans[(connection, seq)]
+
+    def _free_slot(self, poll=1.0):
+        """Next free ring slot. Raises RuntimeError if a worker process died: the slots it holds never come back."""
+        while True:
+            try:
+                return self.free_slots.get(timeout=poll)
+            except queue.Empty:
+                dead = [f"{detector} (pid {process.pid})" for detector, process in self.processes
+                        if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Detector worker died: {', '.join(dead)}")
+
+    def _combine_loop(self, connection, conn, pending, done, stop, poll=0.1):
+        """Collects worker results and sends one reply per frame, in order, until stop is set."""
+        next_seq = 0
+        while True:
+            try:
+                item = self.results.get(timeout=poll)
+            except queue.Empty:
+                # Polled rather than woken by an end marker: a killed worker can leave the queue's write lock held
+                if stop.is_set():
+                    return
+                continue
+            item_connection, seq, detector, detector_fields, elapsed = item
+            if item_connection != connection:
+                self._settle_orphan(item_connection, seq)
+                continue
+            # A frame rejected by ingest is already marked in pending (fields None); its item only wakes us
+            if detector is not None:
+                self.detect_times[detector].append(elapsed)
+                pending[seq][2][detector] = detector_fields
+
+            while next_seq in pending and (pending[next_seq][2] is None
+                                           or len(pending[next_seq][2]) == len(self.detectors)):
+                slot, received_at, fields = pending.pop(next_seq)
+                if slot is not None:
+                    self.free_slots.put(slot)
+                if fields is None or None in fields.values():
+                    reply = ERROR_FIELDS
+                else:
+                    reply = combine_fields(fields)
+                try:
+                    if self.binary:
+                        conn.sendall(encode_reply(next_seq, processing_time=time.monotonic() - received_at, **reply))
+                    else:
+                        conn.sendall(reply["decision"].encode())
+                except OSError:
+                    pass  # The receive loop notices the closed connection
+                self.latencies.append(time.monotonic() - received_at)
+                next_seq += 1
+                with done:
+                    done.notify_all()
+
+    def serve(self, conn):
+        """Serves one connection until the client disconnects."""
+        self.connection += 1
+        connection = self.connection
+        pending = {}  # seq -> [slot, received_at, {detector: fields}, or None if the frame was rejected]
+        done = threading.Condition()
+        stop = threading.Event()
+        combiner = threading.Thread(target=self._combine_loop, args=(connection, conn, pending, done, stop),
+                                    daemon=True)
+        combiner.start()
+
+        receiver = FrameReceiver(conn)
+        seq = 0
+        try:
+            while True:
+                frame_data = receiver.receive()
+                if frame_data is None:
+                    print("Client disconnected.")
+                    break
+                received_at = time.monotonic()
+                try:
+                    frame = decode_frame(frame_data, self.decode_mode)
+                except Exception as error:
+                    print(f"Frame {seq} failed to decode: {error!r}")
+                    frame = None
+                if frame is None or frame.shape[1] > self.ring.max_width or frame.shape[0] > self.ring.max_height:
+                    print(f"Frame {seq} is undecodable or larger than the ring, replying STOP")
+                    pending[seq] = [None, received_at, None]
+                    self.results.put((connection, seq, None, None, 0.0))
+                else:
+                    slot = self._free_slot()  # Blocks while every slot is still being read
+                    self.ring.write(slot, seq, frame, with_gray=self.needs_gray)
+                    pending[seq] = [slot, received_at, {}]
+                    for detector in self.detectors:
+                        self.tasks[detector].put((connection, seq, slot))
+                seq += 1
+                self.frames += 1
+        except (ConnectionResetError, BrokenPipeError):
+            print("Connection lost.")
+        except RuntimeError as error:
+            print(f"{error}; closing the connection.")
+        finally:
+            # Let the workers finish the frames in flight before their slots are reused
+            with done:
+                done.wait_for(lambda: not pending, timeout=10)
+            stop.set()
+            combiner.join()
+            # Frames still in flight keep their slots until their last late result comes in
+            for seq, (slot, _, fields) in pending.items():
+                if slot is not None:
+                    self.orphans[(connection, seq)] = [slot, len(self.detectors) - len(fields)]
+
+    def report(self):
+        latencies = sorted(self.latencies)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        detect = ", ".join(f"{d} {sum(t) / max(len(t), 1) * 1000:.2f} ms" for d, t in self.detect_times.items())
+        return f"{self.frames} frames, latency p50 {p50:.1f} ms; detect CPU time {detect}"
+
+    def close(self):
+        for detector, process in self.processes:
+            self.tasks[detector].put(None)
+        for _, process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()  # Stuck, e.g. on a queue lock a killed worker still holds
+        self.ring.close()
+
+
+def parse_workers(values):
+    """["line=2", ...] -> {"line": 2, ...}"""
+    workers = {}
+    for value in values or []:
+        detector, _, count = value.partition("=")
+        workers[detector] = int(count)
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--detectors", nargs="+", choices=sorted(DETECTORS), default=["line", "stop", "percentage"])
+    parser.add_argument("--workers", nargs="*", metavar="DETECTOR=N", help="processes per detector (default 1)")
+    parser.add_argument("--slots", type=int, default=8, help="frames in the shared ring")
+    parser.add_argument("--max-size", default="1280x720", help="largest frame WIDTHxHEIGHT")
+    parser.add_argument("--no-pin", action="store_true", help="do not pin workers to cores")
+    parser.add_argument("--binary", action="store_true", help="reply with fixed-size binary structs instead of text")
+    args = parser.parse_args()
+
+    max_width, max_height = map(int, args.max_size.split("x"))
+    cores = None
+    if not args.no_pin and hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    server = FanoutServer(args.detectors, parse_workers(args.workers), cores, args.slots,
+                          max_width, max_height, args.binary)
+
+    server_socket = socket.create_server((args.host, args.port))
+    print("Waiting for connection...")
+    try:
+        while True:
+            conn, addr = server_socket.accept()
+            print(f"Connected to {addr}")
+            server.serve(conn)
+            conn.close()
+            print(server.report())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_socket.close()
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Decodes received frame payloads into the representation a detector needs.
+
+Detectors that only look at brightness (the 2x2 grid, the stop detectors)
+accept a single-channel gray image and skip their BGR -> gray conversion, so
+they can use a cheaper decode mode:
+
+    "color"      full-resolution BGR (the original path)
+    "gray"       JPEG decoded straight to gray; libjpeg skips the color conversion
+    "reduced_2"  gray at 1/2 (also "reduced_4", "reduced_8"); libjpeg skips most of the IDCT work
+    "reduced_color_2"  BGR at 1/2 (also 4 and 8)
+
+A client may also send an uncompressed luminance plane instead of a JPEG:
+RAW_Y_HEADER (b"Y800", width, height) followed by width * height bytes. It
+is shaped like a JPEG in the same mode: reduced modes shrink it, and the color
+modes replicate the plane to three BGR channels, so color detectors keep
+working (they see a colorless frame).
+"""
+import struct
+
+import cv2
+import numpy as np
+
+RAW_Y_MAGIC = b"Y800"
+RAW_Y_HEADER = struct.Struct("<4sHH")
+
+DECODE_FLAGS = {
+    "color": cv2.IMREAD_COLOR,
+    "gray": cv2.IMREAD_GRAYSCALE,
+    "reduced_2": cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    "reduced_4": cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    "reduced_8": cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    "reduced_color_2": cv2.IMREAD_REDUCED_COLOR_2,
+    "reduced_color_4": cv2.IMREAD_REDUCED_COLOR_4,
+    "reduced_color_8": cv2.IMREAD_REDUCED_COLOR_8,
+}
+COLOR_MODES = {"color", "reduced_color_2", "reduced_color_4", "reduced_color_8"}
+
+
+def _decode_raw_y(frame_data, mode):
+    _, width, height = RAW_Y_HEADER.unpack_from(frame_data)
+    if width == 0 or height == 0 or len(frame_data) < RAW_Y_HEADER.size + width * height:
+        return None
+    plane = np.frombuffer(frame_data, dtype=np.uint8, count=width * height, offset=RAW_Y_HEADER.size)
+    plane = plane.reshape(height, width)
+    reduction = int(mode.rsplit("_", 1)[1]) if mode.startswith("reduced") else 1
+    if reduction > 1:
+        size = (max(width // reduction, 1), max(height // reduction, 1))
+        plane = cv2.resize(plane, size, interpolation=cv2.INTER_AREA)
+    if mode in COLOR_MODES:
+        return cv2.cvtColor(plane, cv2.COLOR_GRAY2BGR)
+    # Copy out of the receive buffer, which is reused for the next frame
+    return plane.copy() if reduction == 1 else plane
+
+
+def decode_frame(frame_data, mode="color"):
+    """Decodes one payload (JPEG or raw Y plane). Returns None if it cannot be decoded."""
+    if len(frame_data) == 0:  # A zero-length header
+        return None
+    if bytes(frame_data[:4]) == RAW_Y_MAGIC:
+        if len(frame_data) < RAW_Y_HEADER.size:
+            return None
+        return _decode_raw_y(frame_data, mode)
+    try:
+        return cv2.imdecode(np.frombuffer(frame_data, dtype=np.uint8), DECODE_FLAGS[mode])
+    except cv2.error:
+        return None
+
+
+def encode_raw_y(frame):
+    """Client side: packs a BGR or gray frame as an uncompressed Y800 payload."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    return RAW_Y_HEADER.pack(RAW_Y_MAGIC, width, height) + np.ascontiguousarray(gray).tobytes()
+
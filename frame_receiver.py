@@ -0,0 +1,66 @@
+import struct
+
+from metrics import METRICS
+
+HEADER = struct.Struct("Q")
+MAX_FRAME_SIZE = 16 << 20  # Far above any JPEG or raw Y plane a robot camera sends
+
+
+class FrameReceiver:
+    """
+    Receives length-prefixed frames (8-byte "Q" size + payload) from a socket.
+
+    Payloads are read with recv_into straight into a preallocated buffer that
+    only grows when a larger frame arrives, and are returned as a memoryview
+    of that buffer, so no bytes are copied after the kernel hands them over.
+    The view is only valid until the next call to receive().
+
+    A header announcing more than max_frame_size bytes is a protocol error
+    (a corrupt or desynchronized stream): receive() raises
+    ConnectionResetError, which the servers treat as a lost connection,
+    instead of allocating whatever the header asks for.
+    """
+
+    def __init__(self, conn, initial_size=1 << 16, max_frame_size=MAX_FRAME_SIZE):
+        self.conn = conn
+        self.max_frame_size = max_frame_size
+        self.header = bytearray(HEADER.size)
+        self.buffer = bytearray(initial_size)
+        self.bytes_received = 0
+        self.frames_received = 0
+
+    def _recv_exactly(self, view):
+        """Fills view completely. Returns False if the peer closed before sending anything."""
+        received = 0
+        while received < len(view):
+            n = self.conn.recv_into(view[received:])
+            if n == 0:
+                if received == 0:
+                    return False
+                raise ConnectionResetError("Client disconnected mid-frame")
+            received += n
+        self.bytes_received += received
+        return True
+
+    def receive(self):
+        """Returns the next frame payload as a memoryview, or None when the client disconnects."""
+        if not self._recv_exactly(memoryview(self.header)):
+            return None
+
+        msg_size = HEADER.unpack(self.header)[0]
+        if msg_size > self.max_frame_size:
+            raise ConnectionResetError(f"Frame header announces {msg_size} bytes, more than {self.max_frame_size}")
+        if msg_size > len(self.buffer):
+            # Grow to the next power of two so a slowly growing frame size does not reallocate every time
+            self.buffer = bytearray(1 << (msg_size - 1).bit_length())
+
+        payload = memoryview(self.buffer)[:msg_size]
+        with METRICS.time("receive"):
+            if not self._recv_exactly(payload) and msg_size > 0:
+                raise ConnectionResetError("Client disconnected mid-frame")
+
+        self.frames_received += 1
+        METRICS.observe("frame_bytes", msg_size)
+        METRICS.count("bytes_received", HEADER.size + msg_size)
+        METRICS.count("frames_received")
+        return payload
@@ -0,0 +1,166 @@
+import cv2
+import numpy as np
+
+from section_centroids import compute_section_centroids
+
+
+class LineTracker:
+    """
+    Stateful line follower that only searches a window around the predicted line.
+
+    Each section centroid is tracked with a constant-velocity (alpha-beta)
+    filter. The next frame is thresholded only in the columns around the
+    predicted positions plus `margin`. When too few sections are found or they
+    land far from the prediction, confidence drops below `min_confidence` and
+    the frame is processed again over its full width.
+
+    update(frame) is a drop-in for detect_black_line_and_color and returns the
+    same tuple, except that mask only covers the searched window and the
+    deviation value comes from the filtered bottom section. As in
+    detect_black_line_and_color, a TURN needs the top section to be found in
+    this frame; sections that were only predicted never drive a decision.
+    """
+
+    def __init__(self, threshold=60, num_sections=4, margin=80, min_confidence=0.5,
+                 alpha=0.6, beta=0.2, color_classifier=None):
+        self.threshold = threshold
+        self.num_sections = num_sections
+        self.margin = margin
+        self.min_confidence = min_confidence
+        self.alpha = alpha
+        self.beta = beta
+        self.color_classifier = color_classifier
+
+        self.positions = None  # Filtered x of each section (full frame coordinates)
+        self.velocities = None
+        self.measured = None  # Sections found in the last frame (the others are predictions)
+        self.confidence = 0.0
+        self.pixels_processed = 0  # Pixels thresholded for the last frame
+        self.full_frame_searches = 0
+
+    def reset(self):
+        self.positions = None
+        self.velocities = None
+        self.measured = None
+        self.confidence = 0.0
+
+    def _predict(self):
+        return self.positions + self.velocities
+
+    def _window(self, frame_width):
+        """Column range to search, or the full width when not tracking."""
+        if self.positions is None or self.confidence < self.min_confidence:
+            return 0, frame_width
+        predicted = self._predict()
+        x0 = max(0, int(predicted.min()) - self.margin)
+        x1 = min(frame_width, int(predicted.max()) + self.margin)
+        return (x0, x1) if x1 > x0 else (0, frame_width)
+
+    def _detect(self, frame, x0, x1):
+        """Finds the largest contour in columns x0:x1 and its section centroids in frame coordinates."""
+        gray = cv2.cvtColor(frame[:, x0:x1], cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
+        self.pixels_processed = mask.size
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, 0))
+
+        if not contours:
+            return mask, None, [], [], None
+
+        largest_contour = max(contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(largest_contour)
+        frame_center = frame.shape[1] // 2
+
+        # Centroids are computed on the window mask, then shifted back by x0
+        deviations, middle_points, _ = compute_section_centroids(
+            mask, (x - x0, y, w, h), frame_center - x0, self.num_sections)
+        deviations = [(cx + x0, cy, deviation) for (cx, cy, deviation) in deviations]
+        middle_points = [(frame_center, my) for (_, my) in middle_points]
+        return mask, largest_contour, deviations, middle_points, (x, y, w, h)
+
+    def _update_filter(self, deviations, rect):
+        """Updates the section filters and returns the track confidence for this frame."""
+        x, y, w, h = rect
+        section_height = max(h // self.num_sections, 1)
+        measured = np.full(self.num_sections, np.nan)
+        for (cx, cy, _) in deviations:
+            measured[min((cy - y) // section_height, self.num_sections - 1)] = cx
+
+        found = ~np.isnan(measured)
+        self.measured = found
+        if self.positions is None:
+            if not found.any():
+                return 0.0
+            self.positions = np.where(found, measured, np.nanmean(measured))
+            self.velocities = np.zeros(self.num_sections)
+            return found.mean()
+
+        predicted = self._predict()
+        residual = np.where(found, measured - predicted, 0.0)
+        in_gate = found & (np.abs(residual) < self.margin)
+
+        self.positions = predicted + self.alpha * residual
+        self.velocities = self.velocities + self.beta * residual
+        return in_gate.mean()
+
+    def update(self, frame):
+        frame_width = frame.shape[1]
+        frame_center = frame_width // 2
+        x0, x1 = self._window(frame_width)
+
+        mask, largest_contour, deviations, middle_points, rect = self._detect(frame, x0, x1)
+        tracking = (x0, x1) != (0, frame_width)
+        confidence = self._update_filter(deviations, rect) if rect else 0.0
+
+        if confidence < self.min_confidence:
+            # Lost the track: restart the filters, searching the whole frame if we only looked at a window
+            self.reset()
+            if tracking:
+                self.full_frame_searches += 1
+                mask, largest_contour, deviations, middle_points, rect = self._detect(frame, 0, frame_width)
+            confidence = self._update_filter(deviations, rect) if rect else 0.0
+        self.confidence = confidence
+
+        contour_path = None
+        direction = "STOP"
+        deviation_value = 0
+        line_color = "NO COLOR"
+
+        if largest_contour is not None:
+            epsilon = 0.005 * cv2.arcLength(largest_contour, True)
+            contour_path = cv2.approxPolyDP(largest_contour, epsilon, True)
+
+            if self.color_classifier is not None:
+                x, y, w, h = rect
+                line_mask = np.zeros((h, w), dtype=np.uint8)
+                cv2.drawContours(line_mask, [largest_contour], -1, 255, thickness=cv2.FILLED, offset=(-x, -y))
+                hsv = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2HSV)
+                color = self.color_classifier.first_detected(self.color_classifier.count(hsv, line_mask), 500)
+                if color:
+                    line_color = f"{color} DETECTED"
+
+        if deviations and self.positions is not None and self.measured.any():
+            # Steer from the filtered positions instead of the raw centroids to remove jitter,
+            # but only from sections measured in this frame
+            measured = np.flatnonzero(self.measured)
+            deviation_value = int(self.positions[measured[-1]]) - frame_center
+
+            if self.measured[0]:
+                top_deviation = int(self.positions[0]) - frame_center
+                if top_deviation < -100:
+                    direction = "TURN LEFT"
+                elif top_deviation > 100:
+                    direction = "TURN RIGHT"
+                elif top_deviation < -20:
+                    direction = "ADJUST LEFT"
+                elif top_deviation > 20:
+                    direction = "ADJUST RIGHT"
+                else:
+                    direction = "STRAIGHT"
+            elif deviation_value < -20:
+                direction = "ADJUST LEFT"
+            elif deviation_value > 20:
+                direction = "ADJUST RIGHT"
+            else:
+                direction = "FORWARD"
+
+        return mask, deviations, middle_points, contour_path, direction, deviation_value, line_color
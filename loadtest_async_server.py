@@ -0,0 +1,105 @@
+"""
+Load test for async_server.py.
+
+Starts the server in a subprocess and connects 1, 2, 4, 8 and 16 simulated
+robots. Each robot sends a synthetic track frame, waits for the reply and
+repeats. Prints aggregate FPS and per-robot latency for each connection count.
+
+    python loadtest_async_server.py --detector line --duration 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_frame(width=640, height=480):
+    """A light background with a dark line bending to the right, encoded as JPEG."""
+    frame = np.full((height, width, 3), 200, dtype=np.uint8)
+    points = np.array([[width // 2 - 20, 0], [width // 2 + 20, 0],
+                       [width // 2 + 100, height], [width // 2 + 60, height]])
+    cv2.fillPoly(frame, [points], (20, 20, 20))
+    _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return jpeg.tobytes()
+
+
+async def robot(host, port, message, deadline):
+    """Sends frames one at a time until deadline. Returns the list of round-trip latencies."""
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        writer.write(message)
+        await writer.drain()
+        if not await reader.read(64):
+            break
+        latencies.append(time.monotonic() - start)
+    writer.close()
+    await writer.wait_closed()
+    return latencies
+
+
+async def run_load(host, port, message, robots, duration):
+    deadline = time.monotonic() + duration
+    return await asyncio.gather(*(robot(host, port, message, deadline) for _ in range(robots)))
+
+
+def wait_for_port(host, port, timeout=30):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server did not start on port {port}")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--detector", default="line")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per connection count")
+    parser.add_argument("--robots", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    command = [sys.executable, os.path.join(HERE, "async_server.py"), "--host", "127.0.0.1",
+               "--port", str(args.port), "--detector", args.detector]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    server = subprocess.Popen(command, cwd=HERE, stdout=subprocess.DEVNULL)
+
+    try:
+        wait_for_port("127.0.0.1", args.port)
+        jpeg = make_frame()
+        message = struct.pack("Q", len(jpeg)) + jpeg
+
+        print(f"{'robots':>6} {'total FPS':>10} {'FPS/robot':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for robots in args.robots:
+            results = asyncio.run(run_load("127.0.0.1", args.port, message, robots, args.duration))
+            latencies = [latency for robot_latencies in results for latency in robot_latencies]
+            fps = len(latencies) / args.duration
+            print(f"{robots:>6} {fps:>10.1f} {fps / robots:>10.1f} "
+                  f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Loopback harness for stream_client.py against a slowed-down server.
+
+Runs one of the single-robot servers in this process on 127.0.0.1 (headless,
+binary replies) and wraps its detector so that, after --slow-after seconds,
+every frame takes an extra --delay seconds per 640x480 worth of pixels.
+Synthetic track frames are streamed at --fps, first by a fixed sender (full
+quality and rate, no limit on frames in flight, like a hand-rolled sender)
+and then by the adaptive client. Prints the reply latency per second of each
+run: the fixed sender's latency keeps growing once the server slows down,
+the adaptive client's stays bounded.
+
+    python loopback_stream_client.py --server percentage_stopper.py --delay 0.08
+    python loopback_stream_client.py --server stop_detector_with_camera_ras --pipelined
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import socket
+import threading
+import time
+
+from script_loader import load_script
+from stream_client import AdaptiveController, StreamClient
+from synthetic_track import SCENES, generate_frame
+
+# server script -> detector function its receive_video calls
+SERVERS = {
+    "percentage_stopper.py": "detect_horizontal_lines",
+    "new_line_detector_v2": "detect_black_line_and_color",
+    "stop_detector_with_camera_ras": "detect",
+}
+REFERENCE_PIXELS = 640 * 480
+
+
+def slowed(detect, delay, slow_after):
+    """detect that sleeps delay * (pixels / 640x480) once slow_after seconds have passed."""
+    start = time.monotonic()
+
+    def slow_detect(frame, *args, **kwargs):
+        if time.monotonic() - start >= slow_after:
+            time.sleep(delay * frame.shape[0] * frame.shape[1] / REFERENCE_PIXELS)
+        return detect(frame, *args, **kwargs)
+    return slow_detect
+
+
+def serve_once(module, listener, pipelined):
+    """Accepts one connection and serves it with the module's server loop."""
+    conn, _ = listener.accept()
+    with contextlib.redirect_stdout(io.StringIO()), conn:
+        if pipelined:
+            module.PipelinedServer(module.process_frame, workers=module.PIPELINE_WORKERS,
+                                   reply_encoder=module.binary_reply).serve(conn)
+        else:
+            module.receive_video(conn)
+
+
+def run(name, module, detect, client_factory, args, frames):
+    """Streams frames for args.duration against a fresh slowed server. Returns [(seconds, latency)]."""
+    setattr(module, SERVERS[args.server], slowed(detect, args.delay, args.slow_after))
+    listener = socket.create_server(("127.0.0.1", 0))
+    server = threading.Thread(target=serve_once, args=(module, listener, args.pipelined), daemon=True)
+    server.start()
+
+    start = time.monotonic()
+    timeline = []
+    client = client_factory(listener.getsockname()[1],
+                            lambda reply, latency: timeline.append((time.monotonic() - start, latency)))
+    client.connect()
+    client.stream(itertools.cycle(frames), args.fps, args.duration)
+    client.close()
+    server.join(timeout=5)
+    listener.close()
+    print(f"{name}: {client.report()}")
+    return timeline
+
+
+def per_second(timeline, duration):
+    """Worst latency (ms) of the replies received in each second; None if there were none."""
+    worst = [None] * int(duration + 1)
+    for at, latency in timeline:
+        second = min(int(at), len(worst) - 1)
+        worst[second] = max(worst[second] or 0.0, latency * 1000)
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=sorted(SERVERS), default="percentage_stopper.py")
+    parser.add_argument("--pipelined", action="store_true", help="serve with PipelinedServer (drops stale frames)")
+    parser.add_argument("--delay", type=float, default=0.08, help="extra seconds per 640x480 frame once slowed")
+    parser.add_argument("--slow-after", type=float, default=2.0, help="seconds before the server slows down")
+    parser.add_argument("--duration", type=float, default=8.0, help="seconds per run")
+    parser.add_argument("--fps", type=float, default=30.0, help="rate frames are captured at")
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--target-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    module = load_script(args.server)
+    if args.pipelined and not hasattr(module, "process_frame"):
+        parser.error(f"{args.server} has no pipelined mode")
+    module.HEADLESS = True
+    module.BINARY_REPLIES = True
+    detect = getattr(module, SERVERS[args.server])
+    frames = [generate_frame(scene, "clean", 640, 480, seed=i)[0] for i, scene in enumerate(SCENES)]
+
+    def fixed(port, on_reply):
+        controller = AdaptiveController(qualities=(90,), scales=(1.0,), rates=(args.fps,))
+        return StreamClient("127.0.0.1", port, max_in_flight=1 << 20, binary=True, controller=controller,
+                            on_reply=on_reply)
+
+    def adaptive(port, on_reply):
+        controller = AdaptiveController(args.target_latency, rates=(args.fps, 20, 10, 5))
+        return StreamClient("127.0.0.1", port, max_in_flight=args.max_in_flight, binary=True,
+                            controller=controller, on_reply=on_reply)
+
+    fixed_timeline = per_second(run("fixed", module, detect, fixed, args, frames), args.duration)
+    adaptive_timeline = per_second(run("adaptive", module, detect, adaptive, args, frames), args.duration)
+
+    print(f"\nWorst reply latency per second (server slowed from {args.slow_after:.0f} s)")
+    print(f"{'second':>6} {'fixed ms':>10} {'adaptive ms':>12}")
+    for second, (a, b) in enumerate(zip(fixed_timeline, adaptive_timeline)):
+        print(f"{second:>6} {'-' if a is None else f'{a:.0f}':>10} {'-' if b is None else f'{b:.0f}':>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import atexit
+import contextlib
+import csv
+import http.server
+import threading
+import time
+
+import numpy as np
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name + "_seconds"
+
+    def __enter__(self):
+        self.start = time.monotonic()
+
+    def __exit__(self, *exc):
+        end = time.monotonic()
+        self.metrics.observe(self.name, end - self.start, end)
+
+
+class Metrics:
+    """
+    Lightweight per-stage instrumentation.
+
+    Every observed series (stage durations in seconds, frame sizes in bytes)
+    goes into its own fixed-size ring buffer of (timestamp, value) pairs.
+    Counters track totals such as bytes received and decisions sent. When
+    disabled, time() returns a shared no-op context manager and the other
+    methods return immediately.
+
+        with METRICS.time("decode"):
+            frame = cv2.imdecode(...)
+        METRICS.decision(direction)
+    """
+
+    def __init__(self, enabled=False, size=4096, prefix="line_follower"):
+        self.enabled = enabled
+        self.size = size
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.rings = {}  # name -> [array of shape (size, 2), number of values written]
+        self.counters = {}
+        self.decisions = {}
+        self.http_server = None
+
+    def time(self, name):
+        """Context manager that records the duration of the block under "<name>_seconds"."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def observe(self, name, value, timestamp=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            ring = self.rings.get(name)
+            if ring is None:
+                ring = self.rings[name] = [np.zeros((self.size, 2)), 0]
+            ring[0][ring[1] % self.size] = (timestamp or time.monotonic(), value)
+            ring[1] += 1
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def decision(self, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.decisions[value] = self.decisions.get(value, 0) + 1
+
+    def values(self, name):
+        """Values currently in the ring buffer of name, oldest first."""
+        with self.lock:
+            data, written = self.rings[name]
+            if written <= self.size:
+                return data[:written].copy()
+            start = written % self.size
+            return np.concatenate([data[start:], data[:start]])
+
+    def percentiles(self, name, quantiles=(50, 90, 99)):
+        values = self.values(name)[:, 1]
+        return dict(zip(quantiles, np.percentile(values, quantiles))) if len(values) else {}
+
+    def snapshot(self):
+        """Copies of ({series: values written}, counters, decisions), taken under the lock."""
+        with self.lock:
+            return {name: ring[1] for name, ring in self.rings.items()}, dict(self.counters), dict(self.decisions)
+
+    def prometheus_text(self):
+        """Rolling percentiles and counters in the Prometheus text exposition format."""
+        # Readers run on other threads (HTTP, atexit) while detectors add series and counters
+        written, counters, decisions = self.snapshot()
+        lines = []
+        for name in sorted(written):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} summary")
+            for q, value in self.percentiles(name).items():
+                lines.append(f'{metric}{{quantile="{q / 100}"}} {value:.6g}')
+            lines.append(f"{metric}_count {written[name]}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+            lines.append(f"{self.prefix}_{name}_total {value}")
+        if decisions:
+            lines.append(f"# TYPE {self.prefix}_decisions_total counter")
+            for decision, value in sorted(decisions.items()):
+                lines.append(f'{self.prefix}_decisions_total{{decision="{decision}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def serve_http(self, port, host="127.0.0.1"):
+        """Serves prometheus_text() on http://host:port/metrics from a background thread."""
+        metrics = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        self.http_server.daemon_threads = True
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+    def dump_csv(self, path):
+        """Writes every ring buffer as rows of (series, timestamp, value), plus counters and decisions."""
+        written, counters, decisions = self.snapshot()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["series", "timestamp", "value"])
+            for name in sorted(written):
+                for timestamp, value in self.values(name):
+                    writer.writerow([name, f"{timestamp:.6f}", f"{value:.9g}"])
+            for name, value in sorted(counters.items()):
+                writer.writerow([f"{name}_total", "", value])
+            for decision, value in sorted(decisions.items()):
+                writer.writerow([f"decision:{decision}", "", value])
+
+    def enable(self, http_port=None, csv_path=None):
+        """Turns recording on, optionally with the HTTP endpoint and a CSV dump at exit."""
+        self.enabled = True
+        if http_port is not None:
+            self.serve_http(http_port)
+        if csv_path is not None:
+            atexit.register(self.dump_csv, csv_path)
+
+
+# Shared instance used by the receive loop and the detectors; disabled until enable() is called
+METRICS = Metrics()
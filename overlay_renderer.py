@@ -0,0 +1,138 @@
+import http.server
+import os
+import threading
+import time
+
+import cv2
+
+
+def draw_annotations(frame, annotations):
+    """
+    Draws annotation primitives collected by the detectors onto frame:
+        ("line", pt1, pt2, color, thickness)
+        ("rect", pt1, pt2, color, thickness)
+        ("circle", center, radius, color, thickness)
+        ("contour", contour, color, thickness)
+        ("text", text, org, scale, color, thickness)
+    Gray frames are converted to BGR first so the colors survive.
+    """
+    if frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    for kind, *args in annotations:
+        if kind == "line":
+            cv2.line(frame, *args)
+        elif kind == "rect":
+            cv2.rectangle(frame, *args)
+        elif kind == "circle":
+            cv2.circle(frame, *args)
+        elif kind == "contour":
+            contour, color, thickness = args
+            cv2.drawContours(frame, [contour], -1, color, thickness)
+        elif kind == "text":
+            text, org, scale, color, thickness = args
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+    return frame
+
+
+class OverlayRenderer:
+    """
+    Draws debug overlays on its own thread at no more than max_fps.
+
+    submit() only keeps a reference to the newest frame, and frames that
+    arrive faster than max_fps are ignored, so the control loop never waits
+    for drawing or encoding. Annotated frames are written as JPEG to `path`
+    (overwritten each time) and/or served as an MJPEG stream on
+    http://<host>:<http_port>/.
+    """
+
+    def __init__(self, path=None, http_port=None, max_fps=5, size=(640, 480), host="0.0.0.0"):
+        self.path = path
+        self.interval = 1.0 / max_fps
+        self.size = size
+        self.condition = threading.Condition()
+        self.pending = None
+        self.next_time = 0.0
+        self.jpeg = None  # Latest encoded overlay
+        self.jpeg_id = 0
+        self.running = True
+
+        threading.Thread(target=self._render_loop, daemon=True).start()
+
+        self.http_server = None
+        if http_port is not None:
+            self.http_server = http.server.ThreadingHTTPServer((host, http_port), self._handler_class())
+            self.http_server.daemon_threads = True
+            threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+    def submit(self, frame, annotations):
+        """Queues a frame for drawing unless the rate cap says to skip it. Returns True if queued."""
+        now = time.monotonic()
+        if now < self.next_time:
+            return False
+        self.next_time = now + self.interval
+        with self.condition:
+            self.pending = (frame, annotations)
+            self.condition.notify_all()
+        return True
+
+    def _render_loop(self):
+        while True:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame, annotations = self.pending
+                self.pending = None
+
+            frame = draw_annotations(frame, annotations or [])
+            if self.size is not None:
+                frame = cv2.resize(frame, self.size)
+            ok, jpeg = cv2.imencode(".jpg", frame)
+            if not ok:
+                continue
+
+            if self.path is not None:
+                # Write then rename so readers never see a half-written file
+                with open(self.path + ".tmp", "wb") as f:
+                    f.write(jpeg.tobytes())
+                os.replace(self.path + ".tmp", self.path)
+            with self.condition:
+                self.jpeg = jpeg.tobytes()
+                self.jpeg_id += 1
+                self.condition.notify_all()
+
+    def _handler_class(self):
+        renderer = self
+
+        class MJPEGHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                last_id = -1
+                try:
+                    while renderer.running:
+                        with renderer.condition:
+                            renderer.condition.wait_for(lambda: renderer.jpeg_id != last_id or not renderer.running)
+                            jpeg, last_id = renderer.jpeg, renderer.jpeg_id
+                        if jpeg is None:
+                            continue
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg + b"\r\n")
+                except (ConnectionResetError, BrokenPipeError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return MJPEGHandler
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
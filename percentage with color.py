@@ -1,14 +1,21 @@
-def detect_colors(frame, threshold=50, area_threshold=65):
-    """Detects black, red, green, and blue colors in four ROIs."""
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    _, black_mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
-    
-    # Color masks in HSV
-    red_mask = cv2.inRange(hsv, (0, 100, 100), (10, 255, 255)) + cv2.inRange(hsv, (160, 100, 100), (180, 255, 255))
-    green_mask = cv2.inRange(hsv, (40, 40, 40), (90, 255, 255))
-    blue_mask = cv2.inRange(hsv, (90, 50, 50), (140, 255, 255))
-    
+import cv2
+
+from color_classifier import HSVColorClassifier
+from roi_engine import ROIEngine
+
+# Color ranges in HSV (red wraps around hue 180)
+ROI_COLORS = HSVColorClassifier({
+    "red": [(160, 100, 100), (10, 255, 255)],
+    "green": [(40, 40, 40), (90, 255, 255)],
+    "blue": [(90, 50, 50), (140, 255, 255)],
+})
+
+
+def detect_colors(frame, threshold=50, area_threshold=65, hsv=None, black_mask=None, annotations=None):
+    """
+    Detects black, red, green, and blue colors in four ROIs. Precomputed HSV and black mask can be passed in.
+    The ROIs are appended to annotations (if given) instead of being drawn.
+    """
     frame_height, frame_width = frame.shape[:2]
     box_height = int(frame_height * 0.1)
     row_gap = int(frame_height * 0.2)
@@ -32,22 +39,20 @@ def detect_colors(frame, threshold=50, area_threshold=65):
         (roi_y2_start, roi_y2_end, roi_x2_start, roi_x2_end)   # Bottom-Right
     ]
     
-    results = []
-    
-    for (y1, y2, x1, x2) in rois:
-        roi_black = black_mask[y1:y2, x1:x2]
-        roi_red = red_mask[y1:y2, x1:x2]
-        roi_green = green_mask[y1:y2, x1:x2]
-        roi_blue = blue_mask[y1:y2, x1:x2]
-        
-        total_pixels = roi_black.shape[0] * roi_black.shape[1]
-        black_percentage = (cv2.countNonZero(roi_black) / total_pixels) * 100
-        red_percentage = (cv2.countNonZero(roi_red) / total_pixels) * 100
-        green_percentage = (cv2.countNonZero(roi_green) / total_pixels) * 100
-        blue_percentage = (cv2.countNonZero(roi_blue) / total_pixels) * 100
-        
-        results.append((black_percentage, red_percentage, green_percentage, blue_percentage))
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+    # Percentages of every class in every ROI from integral images; only the area around the ROIs is converted
+    engine = ROIEngine(rois)
+    if black_mask is None:
+        gray = cv2.cvtColor(engine.crop(frame), cv2.COLOR_BGR2GRAY)
+        _, crop_mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+        black = engine.occupancy(crop_mask, cropped=True)
+    else:
+        black = engine.occupancy(black_mask)
+    colors = engine.color_occupancy(frame, ROI_COLORS, hsv)
+    results = list(zip(black.tolist(), colors["red"].tolist(), colors["green"].tolist(), colors["blue"].tolist()))
+
+    if annotations is not None:
+        for (y1, y2, x1, x2) in rois:
+            annotations.append(("rect", (x1, y1), (x2, y2), (0, 0, 255), 2))
     
     # Check for color detection across all boxes
     color_detected = {
@@ -1,23 +1,51 @@
 import cv2
-import numpy as np
+import functools
 import socket
-import struct
+import time
 
-# Socket setup
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server_socket.bind(("0.0.0.0", 8080))  # Listen on all network interfaces
-server_socket.listen(5)
+from auto_calibration import AutoCalibrator
+from frame_decoder import decode_frame
+from frame_receiver import FrameReceiver
+from metrics import METRICS
+from overlay_renderer import OverlayRenderer, draw_annotations
+from pipelined_server import PipelinedServer
+from reply_protocol import encode_reply
+from roi_engine import ROIEngine
+from stream_log import StreamRecorder
 
-print("Waiting for connection...")
+# Pipelined mode: receive, detect and reply concurrently, dropping stale frames
+PIPELINED = False
+PIPELINE_WORKERS = 2
 
-def detect_horizontal_lines(frame, threshold=50, area_threshold=65):
+# Headless mode: no display window. Debug overlays are drawn on their own thread only if an output is set
+HEADLESS = False
+OVERLAY_PATH = None  # e.g. "overlay.jpg"
+OVERLAY_HTTP_PORT = None  # e.g. 8081 -> MJPEG stream on http://<host>:8081/
+OVERLAY_MAX_FPS = 5
+
+# Per-stage timing metrics: Prometheus-style text on http://127.0.0.1:<port>/metrics and/or a CSV dump on exit
+METRICS_PORT = None  # e.g. 9100
+METRICS_CSV = None  # e.g. "metrics.csv"
+
+# Record incoming frames and the decisions sent to an append-only log (replay with stream_log.py)
+RECORD_PATH = None  # e.g. "run.lflog"
+
+# Binary replies: a fixed-size struct (reply_protocol.py) with frame number, decision code and processing time instead of text
+BINARY_REPLIES = False
+
+# Decode mode (frame_decoder.py): the grid only needs brightness, so "gray" or "reduced_2" skip the color work
+DECODE_MODE = "color"
+
+# Auto calibration (auto_calibration.py): follow the lighting with a black threshold measured on a subsample every few frames
+AUTO_CALIBRATION = False
+
+def detect_horizontal_lines(frame, threshold=50, area_threshold=65, mask=None, annotations=None):
     """
     Function to detect if four boxes in a 2x2 grid contain enough black pixels.
     Includes gaps between rows and columns.
+    frame may be BGR or already gray. A precomputed threshold mask can be passed in to skip thresholding.
+    The boxes are appended to annotations (if given) instead of being drawn.
     """
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
-
     frame_height, frame_width = frame.shape[:2]
     
     # Define row positions with gap
@@ -46,16 +74,21 @@ def detect_horizontal_lines(frame, threshold=50, area_threshold=65):
         (roi_y2_start, roi_y2_end, roi_x2_start, roi_x2_end)   # Bottom-Right
     ]
 
-    black_percentages = []
-    for (y1, y2, x1, x2) in rois:
-        roi = mask[y1:y2, x1:x2]
-        black_pixels = cv2.countNonZero(roi)
-        total_pixels = roi.shape[0] * roi.shape[1]
-        black_percentage = (black_pixels / total_pixels) * 100
-        black_percentages.append(black_percentage)
+    # Black percentage of every box from one integral image; only the area around the boxes is thresholded
+    engine = ROIEngine(rois)
+    if mask is None:
+        with METRICS.time("threshold"):
+            crop = engine.crop(frame)
+            gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            _, crop_mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+        black_percentages = engine.occupancy(crop_mask, cropped=True).tolist()
+    else:
+        black_percentages = engine.occupancy(mask).tolist()
 
-        # Draw the boxes
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+    # Boxes to draw later
+    if annotations is not None:
+        for (y1, y2, x1, x2) in rois:
+            annotations.append(("rect", (x1, y1), (x2, y2), (0, 0, 255), 2))
 
     # Decision logic:
     top_left, top_right, bottom_left, bottom_right = black_percentages
@@ -71,41 +104,69 @@ def detect_horizontal_lines(frame, threshold=50, area_threshold=65):
 
     return direction, black_percentages
 
-def receive_video(conn):
-    data = b""
-    payload_size = struct.calcsize("Q")
+def binary_reply(seq, direction, processing_time):
+    """Packs a grid decision; FORWARD means nothing blocks the way."""
+    stop_state = "CONTINUE" if direction == "FORWARD" else direction
+    return encode_reply(seq, direction, stop_state=stop_state, processing_time=processing_time)
+
+def receive_video(conn, overlay=None, recorder=None):
+    receiver = FrameReceiver(conn)
+    calibration = AutoCalibrator(threshold=50) if AUTO_CALIBRATION else None
 
     try:
         while True:
-            while len(data) < payload_size:
-                packet = conn.recv(4096)
-                if not packet:
-                    print("Client disconnected.")
-                    return
-                data += packet
-
-            packed_msg_size = data[:payload_size]
-            data = data[payload_size:]
-            msg_size = struct.unpack("Q", packed_msg_size)[0]
-
-            while len(data) < msg_size:
-                data += conn.recv(4096)
+            frame_data = receiver.receive()
+            if frame_data is None:
+                print("Client disconnected.")
+                return
+            received_at = time.monotonic()
 
-            frame_data = data[:msg_size]
-            data = data[msg_size:]
+            if recorder is not None:
+                seq = recorder.record_frame(frame_data)
 
             # Decode JPEG frame
-            frame = cv2.imdecode(np.frombuffer(frame_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            with METRICS.time("decode"):
+                frame = decode_frame(frame_data, DECODE_MODE)
+            if frame is None:  # Corrupt payload: stop until a frame can be read again
+                print("Undecodable frame, replying STOP")
+                conn.sendall(binary_reply(receiver.frames_received - 1, "STOP", time.monotonic() - received_at)
+                             if BINARY_REPLIES else b"STOP")
+                if recorder is not None:
+                    recorder.record_decision(seq, "STOP")
+                continue
+
+            # Only collect drawing primitives when something will show them
+            annotations = [] if not HEADLESS or overlay is not None else None
+
+            threshold = 50
+            if calibration is not None:
+                with METRICS.time("calibrate"):
+                    calibration.update(frame)
+                threshold = calibration.threshold
 
             # Detect horizontal lines
-            direction, black_percentages = detect_horizontal_lines(frame)
-            conn.sendall(direction.encode())
-
-            cv2.putText(frame, f"Direction: {direction}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-            for i, bp in enumerate(black_percentages):
-                cv2.putText(frame, f"Box{i+1}: {bp:.2f}%", (50, 90 + i * 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-            resized_frame = cv2.resize(frame, (640, 480))
+            with METRICS.time("detect"):
+                direction, black_percentages = detect_horizontal_lines(frame, threshold, annotations=annotations)
+            with METRICS.time("send"):
+                if BINARY_REPLIES:
+                    conn.sendall(binary_reply(receiver.frames_received - 1, direction, time.monotonic() - received_at))
+                else:
+                    conn.sendall(direction.encode())
+            METRICS.decision(direction)
+            if recorder is not None:
+                recorder.record_decision(seq, direction)
+
+            if annotations is not None:
+                annotations.append(("text", f"Direction: {direction}", (50, 50), 1, (0, 255, 255), 2))
+                for i, bp in enumerate(black_percentages):
+                    annotations.append(("text", f"Box{i+1}: {bp:.2f}%", (50, 90 + i * 40), 1, (0, 255, 0), 2))
+
+            if HEADLESS:
+                if overlay is not None:
+                    overlay.submit(frame, annotations)
+                continue
+
+            resized_frame = cv2.resize(draw_annotations(frame, annotations), (640, 480))
             cv2.imshow("Real-Time Video", resized_frame)
 
             if cv2.waitKey(1) & 0xFF == ord("q"):
@@ -115,11 +176,49 @@ def receive_video(conn):
         print("Connection lost. Waiting for new connection...")
         return
 
-while True:
-    conn, addr = server_socket.accept()
-    print(f"Connected to {addr}")
-    receive_video(conn)
-    conn.close()
-
-server_socket.close()
-cv2.destroyAllWindows()
+def process_frame(frame_data, calibration=None):
+    """Decodes one JPEG frame and returns the reply for the pipelined server."""
+    frame = decode_frame(frame_data, DECODE_MODE)
+    threshold = 50
+    if calibration is not None:
+        calibration.update(frame)
+        threshold = calibration.threshold
+    direction, _ = detect_horizontal_lines(frame, threshold)
+    return direction
+
+if __name__ == "__main__":
+    # Socket setup
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.bind(("0.0.0.0", 8080))  # Listen on all network interfaces
+    server_socket.listen(5)
+
+    if METRICS_PORT is not None or METRICS_CSV is not None:
+        METRICS.enable(METRICS_PORT, METRICS_CSV)
+
+    overlay = None
+    if OVERLAY_PATH is not None or OVERLAY_HTTP_PORT is not None:
+        overlay = OverlayRenderer(OVERLAY_PATH, OVERLAY_HTTP_PORT, OVERLAY_MAX_FPS)
+
+    recorder = StreamRecorder(RECORD_PATH) if RECORD_PATH is not None else None
+
+    print("Waiting for connection...")
+
+    while True:
+        conn, addr = server_socket.accept()
+        print(f"Connected to {addr}")
+        if PIPELINED:
+            # The workers share one calibration; AutoCalibrator.update() serializes them with its lock
+            calibration = AutoCalibrator(threshold=50) if AUTO_CALIBRATION else None
+            pipeline = PipelinedServer(functools.partial(process_frame, calibration=calibration),
+                                       workers=PIPELINE_WORKERS,
+                                       reply_encoder=binary_reply if BINARY_REPLIES else None)
+            pipeline.serve(conn)
+            print(pipeline.report())
+        else:
+            receive_video(conn, overlay, recorder)
+        conn.close()
+        if recorder is not None:
+            recorder.flush()
+
+    server_socket.close()
+    cv2.destroyAllWindows()
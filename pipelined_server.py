@@ -0,0 +1,171 @@
+import collections
+import socket
+import threading
+import time
+
+from frame_receiver import FrameReceiver
+
+
+class LatestFrameSlot:
+    """Holds the newest received frame. Putting a frame while one is waiting drops the old one."""
+
+    def __init__(self, condition=None):
+        self.condition = condition or threading.Condition()
+        self.item = None
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.condition.notify_all()
+
+    def take(self):
+        """Blocks until a frame is available. Returns None once the slot is closed and empty."""
+        with self.condition:
+            while self.item is None and not self.closed:
+                self.condition.wait()
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class PipelinedServer:
+    """
+    Serves one connection with receive, decode/detect and reply running concurrently.
+
+    A receiver thread drains the socket into a LatestFrameSlot, so frames that
+    arrive while the workers are busy replace each other instead of queueing.
+    process_frame(frame_data) runs on `workers` threads (OpenCV releases the
+    GIL) and returns the reply string. Replies are sent in frame order; dropped
+    frames get no reply.
+
+    reply_encoder(seq, reply, processing_time) can turn the reply into bytes
+    (e.g. a binary reply from reply_protocol.py); by default it is sent as text.
+
+    If process_frame raises (e.g. on a corrupt JPEG), the frame is answered
+    with error_reply and the worker carries on with the next frame.
+    """
+
+    def __init__(self, process_frame, workers=2, history=1000, reply_encoder=None, error_reply="STOP"):
+        self.process_frame = process_frame
+        self.reply_encoder = reply_encoder
+        self.error_reply = error_reply
+        self.workers = workers
+        self.condition = threading.Condition()
+        # Sharing the condition lets a worker take a frame and mark it in flight atomically
+        self.slot = LatestFrameSlot(self.condition)
+        self.in_flight = set()
+        self.results = {}
+        self.active_workers = 0
+        self.frames_received = 0
+        self.frames_replied = 0
+        self.frames_failed = 0
+        self.ages = collections.deque(maxlen=history)  # Seconds from receive to reply, per decision
+
+    def _receive_loop(self, conn):
+        receiver = FrameReceiver(conn)
+        try:
+            while True:
+                frame_data = receiver.receive()
+                if frame_data is None:
+                    break
+                # The receiver reuses its buffer, so the slot keeps its own copy
+                self.slot.put((self.frames_received, time.monotonic(), bytes(frame_data)))
+                self.frames_received += 1
+        except OSError:
+            pass
+        finally:
+            self.slot.close()
+
+    def _worker_loop(self):
+        try:
+            while True:
+                with self.condition:
+                    item = self.slot.take()
+                    if item is None:
+                        break
+                    seq, received_at, frame_data = item
+                    self.in_flight.add(seq)
+
+                failed = False
+                try:
+                    reply = self.process_frame(frame_data)
+                except Exception as error:
+                    # Every frame taken must settle, or the replies after it wait forever
+                    print(f"Frame {seq} failed: {error!r}")
+                    reply = self.error_reply
+                    failed = True
+
+                with self.condition:
+                    self.frames_failed += failed
+                    self.in_flight.discard(seq)
+                    self.results[seq] = (seq, received_at, reply)
+                    self.condition.notify_all()
+        finally:
+            with self.condition:
+                self.active_workers -= 1
+                self.condition.notify_all()
+
+    def _next_reply(self):
+        """Blocks until the oldest finished frame has no older frame still in flight."""
+        with self.condition:
+            while True:
+                if self.results:
+                    seq = min(self.results)
+                    # With no workers left, nothing in flight can finish any more
+                    if not self.in_flight or seq < min(self.in_flight) or self.active_workers == 0:
+                        return self.results.pop(seq)
+                elif self.active_workers == 0:
+                    return None
+                self.condition.wait()
+
+    def serve(self, conn):
+        """Runs the pipeline until the client disconnects."""
+        self.active_workers = self.workers
+        threads = [threading.Thread(target=self._receive_loop, args=(conn,), daemon=True)]
+        threads += [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                result = self._next_reply()
+                if result is None:
+                    break
+                seq, received_at, reply = result
+                if self.reply_encoder is not None:
+                    conn.sendall(self.reply_encoder(seq, reply, time.monotonic() - received_at))
+                else:
+                    conn.sendall(reply.encode())
+                self.ages.append(time.monotonic() - received_at)
+                self.frames_replied += 1
+        except OSError:
+            print("Connection lost. Waiting for new connection...")
+        finally:
+            # Unblock the receiver if we stopped because of a send error
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.slot.close()
+            for thread in threads:
+                thread.join()
+
+    def report(self):
+        """Returns a one-line summary of dropped frames and decision age."""
+        ages = sorted(self.ages)
+        if ages:
+            p50 = ages[len(ages) // 2] * 1000
+            p99 = ages[min(len(ages) - 1, int(len(ages) * 0.99))] * 1000
+            age_text = f"decision age p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+        else:
+            age_text = "no decisions"
+        return (f"Received {self.frames_received} frames, replied {self.frames_replied}, "
+                f"dropped {self.slot.dropped}, failed {self.frames_failed}; {age_text}")
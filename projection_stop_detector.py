@@ -0,0 +1,90 @@
+"""
+Stop symbol detector based on a row projection profile.
+
+Instead of Canny + HoughLinesP over the whole frame, the dark pixels of a
+lower band of the frame are summed per row (one cv2.reduce). Thin rows of
+high fill are the bars; two of them at the stop spacing are the symbol. The
+whole search is a handful of vectorized numpy operations on a 1-D profile.
+"""
+import cv2
+import numpy as np
+
+from scaled_detection import MAX_SPACING_FRACTION, MIN_SPACING_FRACTION
+
+# Bars are thin: a dark band taller than this (fraction of the frame height) is a line or a grid, not a bar
+MAX_BAR_FRACTION = 20 / 480
+
+
+def row_profile(mask, band=(0.25, 1.0)):
+    """Fraction of dark pixels in every row of the band. Returns (profile, first row of the band)."""
+    height = mask.shape[0]
+    y0 = int(band[0] * height)
+    y1 = max(int(band[1] * height), y0 + 1)
+    counts = cv2.reduce(mask[y0:y1], 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+    return counts / (255.0 * mask.shape[1]), y0
+
+
+def find_bars(profile, min_fill=0.25, max_bar_rows=None):
+    """Runs of rows with at least min_fill dark pixels, as (start, end) row arrays (end exclusive)."""
+    above = np.concatenate(([False], profile >= min_fill, [False]))
+    edges = np.flatnonzero(above[1:] != above[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    if max_bar_rows is not None:
+        thin = ends - starts <= max_bar_rows
+        starts, ends = starts[thin], ends[thin]
+    return starts, ends
+
+
+def detect_stop_bars(frame, threshold=60, band=(0.25, 1.0), min_fill=0.25, min_confidence=0.15,
+                     mask=None, annotations=None):
+    """
+    Looks for two thin dark bars across the lower band of the frame.
+
+    frame may be BGR or already gray. band is the (top, bottom) of the
+    searched rows as fractions of the frame height. A precomputed inverted
+    threshold mask (dark -> 255) of the whole frame can be passed in. The bar
+    spacing limits are those of detect_stop_symbol, relative to the frame
+    height.
+
+    Returns (status, bars, confidence): "STOP" or "CONTINUE", the row ranges
+    [(start, end), (start, end)] of the best bar pair in frame coordinates (or
+    [] if none), and the fill of the weaker bar minus the fill of the gap
+    between them (0..1).
+    """
+    if mask is None:
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+
+    height = mask.shape[0]
+    profile, y0 = row_profile(mask, band)
+    starts, ends = find_bars(profile, min_fill, max(int(MAX_BAR_FRACTION * height), 1))
+    if len(starts) < 2:
+        return "CONTINUE", [], 0.0
+
+    # Every pair of neighbouring bars with the right center spacing is a candidate
+    centers = (starts + ends - 1) / 2
+    spacing = np.diff(centers)
+    candidates = np.flatnonzero((spacing > MIN_SPACING_FRACTION * height) & (spacing < MAX_SPACING_FRACTION * height))
+    if len(candidates) == 0:
+        return "CONTINUE", [], 0.0
+
+    # Peak fill of every bar and of the gap after it in one pass: reduceat over
+    # [s0, e0, s1, e1, ...] gives max(bar 0), max(gap 0), max(bar 1), ... (runs never touch, so no gap is empty)
+    maxima = np.maximum.reduceat(np.append(profile, 0.0), np.column_stack((starts, ends)).ravel())
+    peaks, gaps = maxima[0::2], maxima[1::2]
+    confidence = np.minimum(peaks[candidates], peaks[candidates + 1]) - gaps[candidates]
+    best = int(np.argmax(confidence))
+    i = candidates[best]
+    score = float(np.clip(confidence[best], 0.0, 1.0))
+    bars = [(int(starts[i]) + y0, int(ends[i]) + y0), (int(starts[i + 1]) + y0, int(ends[i + 1]) + y0)]
+
+    if score < min_confidence:
+        return "CONTINUE", bars, score
+
+    if annotations is not None:
+        width = mask.shape[1]
+        for start, end in bars:
+            y = (start + end - 1) // 2
+            annotations.append(("line", (0, y), (width - 1, y), (0, 255, 0), 2))
+        annotations.append(("text", f"STOP {score:.2f}", (50, 50), 1, (0, 0, 255), 2))
+    return "STOP", bars, score
@@ -0,0 +1,89 @@
+"""
+Versioned fixed-size binary reply sent back for every frame.
+
+The text replies ("ADJUST LEFT", "PAST_LINE", ...) have no framing, so a
+client cannot split back-to-back replies or match them to frames. A binary
+reply is always REPLY.size (16) bytes, little-endian:
+
+    magic        2s  b"LF"
+    version      B   VERSION
+    decision     B   index into DECISIONS
+    seq          I   frame number on this connection (0 = first frame received)
+    deviation    h   deviation_value in pixels, clamped to int16 (0 if not measured)
+    line_color   B   index into LINE_COLORS
+    stop_state   B   index into STOP_STATES
+    processing   I   server time from frame received to reply sent, in microseconds
+"""
+import collections
+import struct
+
+MAGIC = b"LF"
+VERSION = 1
+REPLY = struct.Struct("<2sBBIhBBI")
+
+# Codes are positions in these lists; only ever append so old clients keep decoding
+DECISIONS = ["UNKNOWN", "STOP", "FORWARD", "STRAIGHT", "ADJUST LEFT", "ADJUST RIGHT",
+             "TURN LEFT", "TURN RIGHT", "CONTINUE", "PAST_LINE"]
+LINE_COLORS = ["NO COLOR", "BLACK", "RED", "GREEN", "BLUE"]
+STOP_STATES = ["UNKNOWN", "CONTINUE", "STOP", "PAST_LINE"]
+
+_DECISION_CODES = {name: code for code, name in enumerate(DECISIONS)}
+_COLOR_CODES = {name: code for code, name in enumerate(LINE_COLORS)}
+_COLOR_CODES["RED2"] = _COLOR_CODES["RED"]  # Second half of the red hue range
+_STOP_CODES = {name: code for code, name in enumerate(STOP_STATES)}
+
+Reply = collections.namedtuple("Reply", "seq decision deviation_value line_color stop_state processing_time")
+
+
+def encode_reply(seq, decision, deviation_value=0, line_color="NO COLOR", stop_state=None, processing_time=0.0):
+    """
+    Packs one reply. line_color may be a detector string such as "RED DETECTED".
+    stop_state defaults to the decision itself when it is a stop state (STOP, CONTINUE, PAST_LINE).
+    """
+    if stop_state is None:
+        stop_state = decision if decision in _STOP_CODES else "UNKNOWN"
+    color = line_color.replace(" DETECTED", "") if isinstance(line_color, str) else "NO COLOR"
+    try:
+        deviation = int(deviation_value)
+    except (TypeError, ValueError):
+        deviation = 0
+    return REPLY.pack(
+        MAGIC,
+        VERSION,
+        _DECISION_CODES.get(decision, 0),
+        seq & 0xFFFFFFFF,
+        max(-32768, min(32767, deviation)),
+        _COLOR_CODES.get(color, 0),
+        _STOP_CODES.get(stop_state, 0),
+        min(int(processing_time * 1e6), 0xFFFFFFFF),
+    )
+
+
+def decode_reply(data):
+    """Unpacks one REPLY.size-byte reply into a Reply with names instead of codes."""
+    magic, version, decision, seq, deviation, color, stop_state, processing = REPLY.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"Not a binary reply: {bytes(data[:2])!r}")
+    if version != VERSION:
+        raise ValueError(f"Unsupported reply version {version}")
+
+    def name(names, code):
+        return names[code] if code < len(names) else "UNKNOWN"
+
+    return Reply(seq, name(DECISIONS, decision), deviation, name(LINE_COLORS, color),
+                 name(STOP_STATES, stop_state), processing / 1e6)
+
+
+def recv_reply(conn):
+    """Client side: reads exactly one binary reply from a socket. Returns None when the server closes."""
+    buffer = bytearray(REPLY.size)
+    view = memoryview(buffer)
+    received = 0
+    while received < REPLY.size:
+        n = conn.recv_into(view[received:])
+        if n == 0:
+            if received == 0:
+                return None
+            raise ConnectionResetError("Server disconnected mid-reply")
+        received += n
+    return decode_reply(buffer)
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+
+class ROIEngine:
+    """
+    Occupancy percentages of many rectangles from integral images.
+
+    rois are (y1, y2, x1, x2) pixel rectangles, the tuple order used by the
+    grid detectors. Only the bounding box of all ROIs (the crop) is ever
+    converted or thresholded. Each class is turned into one integral image of
+    the crop, after which the pixel count of any rectangle is four lookups,
+    done for all ROIs at once. The cost therefore depends on the crop size and
+    the number of classes, not on the number or size of the ROIs.
+
+        engine = ROIEngine.grid(frame.shape, rows=4, cols=8)
+        black = engine.occupancy(black_mask)          # (32,) percentages
+        colors = engine.color_occupancy(frame, classifier)
+    """
+
+    def __init__(self, rois):
+        rois = np.asarray(rois, dtype=np.intp).reshape(-1, 4)
+        self.top, self.left = int(rois[:, 0].min()), int(rois[:, 2].min())
+        self.bottom, self.right = int(rois[:, 1].max()), int(rois[:, 3].max())
+        self.rois = rois
+        # Corners relative to the crop, as index arrays into its (h + 1, w + 1) integral image
+        self.y1, self.y2 = rois[:, 0] - self.top, rois[:, 1] - self.top
+        self.x1, self.x2 = rois[:, 2] - self.left, rois[:, 3] - self.left
+        self.areas = np.maximum((self.y2 - self.y1) * (self.x2 - self.x1), 1)
+
+    @classmethod
+    def grid(cls, shape, rows, cols, region=(0.0, 0.0, 1.0, 1.0), gap=(0.0, 0.0)):
+        """
+        rows x cols cells (row-major) filling region (x0, y0, x1, y1) of a frame
+        of the given shape, separated by gap (x, y); all as fractions of the frame.
+        """
+        height, width = shape[:2]
+        x0, y0, x1, y1 = region
+        cell_w = (x1 - x0 - (cols - 1) * gap[0]) / cols
+        cell_h = (y1 - y0 - (rows - 1) * gap[1]) / rows
+        rois = []
+        for r in range(rows):
+            for c in range(cols):
+                top = y0 + r * (cell_h + gap[1])
+                left = x0 + c * (cell_w + gap[0])
+                rois.append((int(top * height), int((top + cell_h) * height),
+                             int(left * width), int((left + cell_w) * width)))
+        return cls(rois)
+
+    def crop(self, image):
+        """View of the bounding box of all ROIs."""
+        return image[self.top:self.bottom, self.left:self.right]
+
+    def _sums(self, integral):
+        return (integral[self.y2, self.x2] - integral[self.y1, self.x2]
+                - integral[self.y2, self.x1] + integral[self.y1, self.x1])
+
+    def occupancy(self, mask, cropped=False):
+        """
+        Percentage of set pixels of a 0/255 mask (cv2.threshold / inRange output)
+        in every ROI. mask covers the whole frame, or only the crop if cropped.
+        """
+        crop = mask if cropped else self.crop(mask)
+        integral = cv2.integral(crop, sdepth=cv2.CV_32S)
+        return self._sums(integral) / (2.55 * self.areas)
+
+    def label_occupancy(self, labels, num_classes):
+        """
+        Percentages of every class bit of packed labels (HSVColorClassifier.label
+        of the crop, shaped like the crop) in every ROI: shape (ROIs, classes).
+        """
+        result = np.empty((len(self.rois), num_classes))
+        for k in range(num_classes):
+            bits = ((labels >> k) & 1).astype(np.uint8)
+            result[:, k] = self._sums(cv2.integral(bits, sdepth=cv2.CV_32S))
+        return result * 100 / self.areas[:, None]
+
+    def color_occupancy(self, frame, classifier, hsv=None):
+        """
+        {color: percentages per ROI} for every color of an HSVColorClassifier.
+        HSV is only computed on the crop unless a full-frame hsv is passed in.
+        """
+        crop_hsv = self.crop(hsv) if hsv is not None else cv2.cvtColor(self.crop(frame), cv2.COLOR_BGR2HSV)
+        labels = classifier.label(crop_hsv).reshape(crop_hsv.shape[:2])
+        occupancy = self.label_occupancy(labels, len(classifier.colors))
+        return {color: occupancy[:, k] for k, color in enumerate(classifier.colors)}
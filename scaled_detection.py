@@ -0,0 +1,232 @@
+"""
+Line and stop detection on a downscaled copy of the frame.
+
+The detector constants (500 color pixels, the 20/100 px deviation limits,
+Hough minLineLength, the 15-50 px stop bar spacing) were tuned on 640x480
+frames. Here they are fractions of that reference frame, so they keep their
+meaning at any client resolution and any processing scale. All returned
+coordinates and deviations are in the original frame.
+"""
+import cv2
+import numpy as np
+
+from color_classifier import HSVColorClassifier
+from section_centroids import compute_section_centroids
+
+REFERENCE_WIDTH = 640
+REFERENCE_HEIGHT = 480
+
+# Line detector limits as fractions of the frame width / area
+MIN_COLOR_FRACTION = 500 / (REFERENCE_WIDTH * REFERENCE_HEIGHT)
+ADJUST_FRACTION = 20 / REFERENCE_WIDTH
+TURN_FRACTION = 100 / REFERENCE_WIDTH
+
+# Stop detector limits as fractions of the frame height
+HOUGH_VOTES_FRACTION = 50 / REFERENCE_HEIGHT
+MIN_LINE_FRACTION = 30 / REFERENCE_HEIGHT
+MAX_GAP_FRACTION = 15 / REFERENCE_HEIGHT
+MIN_SPACING_FRACTION = 15 / REFERENCE_HEIGHT
+MAX_SPACING_FRACTION = 50 / REFERENCE_HEIGHT
+
+
+def downscale(image, scale):
+    """
+    Pyramid downscale: halves the image with INTER_AREA while scale allows it,
+    then resizes the remainder. Halving is special-cased in OpenCV and much
+    faster than one arbitrary-factor INTER_AREA resize.
+    """
+    height, width = image.shape[:2]
+    target = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+    while image.shape[1] >= 2 * target[0] and image.shape[0] >= 2 * target[1]:
+        image = cv2.resize(image, (image.shape[1] // 2, image.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    if (image.shape[1], image.shape[0]) != target:
+        image = cv2.resize(image, target, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _to_original(value, factor):
+    """Maps a pixel coordinate from the downscaled image back to the original (pixel centers line up)."""
+    return int((value + 0.5) * factor - 0.5)
+
+
+class ScaledLineDetector:
+    """
+    detect_black_line_and_color on a downscaled frame.
+
+    With refine=True (coarse-to-fine) the downscaled frame only locates the
+    line; the section centroids and contour are then computed at full
+    resolution inside the coarse bounding box plus refine_margin (a fraction
+    of the frame width). The line color is always classified on the
+    downscaled frame.
+
+    color_classifier is an HSVColorClassifier or a function of the BGR frame
+    that returns one (such as new_line_detector_v2.adaptive_color_classifier).
+
+    detect(frame) returns the same tuple as detect_black_line_and_color, in
+    original frame coordinates, except that mask is at the processing scale.
+    """
+
+    def __init__(self, scale=0.5, threshold=60, num_sections=4, refine=False, refine_margin=0.05,
+                 color_classifier=None):
+        self.scale = scale
+        self.threshold = threshold
+        self.num_sections = num_sections
+        self.refine = refine
+        self.refine_margin = refine_margin
+        self.color_classifier = color_classifier
+        self.pixels_processed = 0  # Pixels thresholded for the last frame, at any scale
+
+    def _line_color(self, small, contour, rect):
+        if self.color_classifier is None:
+            return "NO COLOR"
+        x, y, w, h = rect
+        line_mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.drawContours(line_mask, [contour], -1, 255, thickness=cv2.FILLED, offset=(-x, -y))
+
+        classifier = self.color_classifier
+        if not isinstance(classifier, HSVColorClassifier):
+            classifier = classifier(small)  # Adaptive classifiers measure the brightness of the whole frame
+        hsv = cv2.cvtColor(small[y:y + h, x:x + w], cv2.COLOR_BGR2HSV)
+
+        min_pixels = MIN_COLOR_FRACTION * small.shape[0] * small.shape[1]
+        color = classifier.first_detected(classifier.count(hsv, line_mask), min_pixels)
+        return f"{color} DETECTED" if color else "NO COLOR"
+
+    def _refine(self, frame, rect, fx, fy):
+        """Full-resolution contour and section centroids inside the mapped coarse bounding box."""
+        height, width = frame.shape[:2]
+        x, y, w, h = rect
+        margin = int(self.refine_margin * width)
+        x0 = max(int(x * fx) - margin, 0)
+        y0 = max(int(y * fy) - margin, 0)
+        x1 = min(int((x + w) * fx) + margin, width)
+        y1 = min(int((y + h) * fy) + margin, height)
+
+        gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
+        self.pixels_processed += mask.size
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+        if not contours:
+            return None, [], [], None
+
+        contour = max(contours, key=cv2.contourArea)
+        cx, cy, cw, ch = cv2.boundingRect(contour)
+        frame_center = width // 2
+        deviations, middle_points, top_dot = compute_section_centroids(
+            mask, (cx - x0, cy - y0, cw, ch), frame_center - x0, self.num_sections)
+        deviations = [(dx + x0, dy + y0, deviation) for (dx, dy, deviation) in deviations]
+        middle_points = [(frame_center, my + y0) for (_, my) in middle_points]
+        top_dot = (top_dot[0] + x0, top_dot[1] + y0) if top_dot else None
+        return contour, deviations, middle_points, top_dot
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        frame_center = width // 2
+        small = downscale(frame, self.scale)
+        fx = width / small.shape[1]
+        fy = height / small.shape[0]
+
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
+        self.pixels_processed = mask.size
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        deviations = []
+        middle_points = []
+        contour_path = None
+        direction = "STOP"
+        deviation_value = 0
+        line_color = "NO COLOR"
+
+        if not contours:
+            return mask, deviations, middle_points, contour_path, direction, deviation_value, line_color
+
+        largest_contour = max(contours, key=cv2.contourArea)
+        rect = cv2.boundingRect(largest_contour)
+        line_color = self._line_color(small, largest_contour, rect)
+
+        if self.refine:
+            contour, deviations, middle_points, top_dot = self._refine(frame, rect, fx, fy)
+        else:
+            small_center = small.shape[1] // 2
+            deviations, middle_points, top_dot = compute_section_centroids(mask, rect, small_center, self.num_sections)
+            deviations = [(_to_original(cx, fx), _to_original(cy, fy), _to_original(cx, fx) - frame_center)
+                          for (cx, cy, _) in deviations]
+            middle_points = [(frame_center, _to_original(my, fy)) for (_, my) in middle_points]
+            top_dot = (_to_original(top_dot[0], fx), _to_original(top_dot[1], fy)) if top_dot else None
+            contour = largest_contour
+
+        if contour is not None:
+            epsilon = 0.005 * cv2.arcLength(contour, True)
+            contour_path = cv2.approxPolyDP(contour, epsilon, True)
+            if not self.refine:
+                contour_path = (contour_path * (fx, fy)).astype(np.int32)
+
+        adjust = ADJUST_FRACTION * width
+        turn = TURN_FRACTION * width
+
+        if deviations:
+            deviation_value = deviations[-1][2]
+            if deviation_value < -adjust:
+                direction = "ADJUST LEFT"
+            elif deviation_value > adjust:
+                direction = "ADJUST RIGHT"
+            else:
+                direction = "FORWARD"
+
+        if top_dot:
+            deviation = top_dot[0] - frame_center
+            if deviation < -turn:
+                direction = "TURN LEFT"
+            elif deviation > turn:
+                direction = "TURN RIGHT"
+            elif deviation < -adjust:
+                direction = "ADJUST LEFT"
+            elif deviation > adjust:
+                direction = "ADJUST RIGHT"
+            else:
+                direction = "STRAIGHT"
+
+        return mask, deviations, middle_points, contour_path, direction, deviation_value, line_color
+
+
+def detect_stop_symbol_scaled(frame, scale=0.5, annotations=None):
+    """
+    detect_stop_symbol (two close horizontal Hough lines) on a downscaled frame,
+    which may be BGR or already gray. Lines appended to annotations are in
+    original frame coordinates.
+    """
+    height = frame.shape[0]
+    small = downscale(frame, scale)
+    factor = height / small.shape[0]
+    small_height = small.shape[0]
+
+    gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    ksize = max(int(5 * small_height / REFERENCE_HEIGHT) | 1, 3)  # 5x5 at the reference height, always odd
+    blurred = cv2.GaussianBlur(gray, (ksize, ksize), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+    lines = cv2.HoughLinesP(edges, 1, np.pi / 180,
+                            threshold=max(int(HOUGH_VOTES_FRACTION * small_height), 1),
+                            minLineLength=MIN_LINE_FRACTION * small_height,
+                            maxLineGap=MAX_GAP_FRACTION * small_height)
+    if lines is None:
+        return "CONTINUE"
+
+    horizontal_lines = []
+    for line in lines:
+        x1, y1, x2, y2 = (_to_original(v, factor) for v in line[0])
+        if abs(y2 - y1) / max(abs(x2 - x1), 1) < 0.1:
+            horizontal_lines.append((x1, y1, x2, y2))
+            if annotations is not None:
+                annotations.append(("line", (x1, y1), (x2, y2), (0, 255, 0), 2))
+
+    min_spacing = MIN_SPACING_FRACTION * height
+    max_spacing = MAX_SPACING_FRACTION * height
+    horizontal_lines.sort(key=lambda line: line[1])
+    for upper, lower in zip(horizontal_lines, horizontal_lines[1:]):
+        if min_spacing < abs(upper[1] - lower[1]) < max_spacing:
+            if annotations is not None:
+                annotations.append(("text", "STOP", (50, 50), 1, (0, 0, 255), 2))
+            return "STOP"
+
+    return "CONTINUE"
@@ -0,0 +1,30 @@
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_loaded = {}
+
+
+def load_script(filename):
+    """
+    Imports one of the detector scripts by file name and returns the module.
+
+    The scripts are named like "base code.py" or "new_line_detector_v2" (with
+    spaces or without a .py extension), so they cannot be imported normally.
+    Modules are cached, so each process loads a script only once.
+    """
+    if filename not in _loaded:
+        path = os.path.join(REPO_DIR, filename)
+        name = "_script_" + "".join(c if c.isalnum() else "_" for c in filename)
+        loader = importlib.machinery.SourceFileLoader(name, path)
+        spec = importlib.util.spec_from_loader(name, loader)
+        module = importlib.util.module_from_spec(spec)
+
+        if REPO_DIR not in sys.path:
+            sys.path.insert(0, REPO_DIR)
+        loader.exec_module(module)
+        _loaded[filename] = module
+    return _loaded[filename]
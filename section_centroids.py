@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+
+def compute_section_centroids(mask, rect, frame_center, num_sections=4):
+    """
+    Computes the centroid of every horizontal section of the line in one pass.
+
+    The bounding box `rect` (x, y, w, h) of the line is split into `num_sections`
+    bands of equal height. All band moments come from row and column histograms
+    of a single view of the mask, so no full-frame copies are made and the cost
+    does not grow with the number of sections.
+
+    Like the original loop, each section follows only its largest blob: a band
+    whose columns hold more than one run of line pixels (a stop bar, a crossing,
+    noise next to the line) is labeled with connectedComponentsWithStats and
+    the centroid of its largest component is used. Unlike the original, only
+    the columns of the bounding box are searched, so blobs beside the line's
+    bounding box are ignored.
+
+    Returns (deviations, middle_points, top_dot) in the same format as the
+    section loop of detect_black_line_and_color.
+    """
+    x, y, w, h = rect
+    section_height = h // num_sections
+
+    middle_points = [(frame_center, int(y + (i + 0.5) * section_height)) for i in range(num_sections)]
+    deviations = []
+    top_dot = None
+
+    if section_height == 0 or w == 0:
+        return deviations, middle_points, top_dot
+
+    # View of the bounding box reshaped to (sections, rows, cols) without copying
+    region = mask[y:y + num_sections * section_height, x:x + w]
+    bands = region.reshape(num_sections, section_height, w)
+
+    # Column and row histograms of each band (values are 0/255, the scale cancels out)
+    col_hist = bands.sum(axis=1, dtype=np.uint32)
+    row_hist = bands.sum(axis=2, dtype=np.uint32)
+
+    xs = np.arange(x, x + w, dtype=np.float64)
+    ys = np.arange(section_height, dtype=np.float64)
+
+    m00 = col_hist.sum(axis=1, dtype=np.float64)
+    m10 = col_hist @ xs
+    m01 = row_hist @ ys + m00 * (y + np.arange(num_sections) * section_height)
+
+    # Runs of occupied columns per band; more than one means more than one blob
+    occupied = col_hist > 0
+    runs = occupied[:, 0].astype(np.int64) + (occupied[:, 1:] & ~occupied[:, :-1]).sum(axis=1)
+
+    for i in np.flatnonzero(m00):
+        if runs[i] > 1:
+            _, _, stats, centroids = cv2.connectedComponentsWithStats(np.ascontiguousarray(bands[i]), connectivity=8)
+            largest = 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
+            cx = int(x + centroids[largest][0])
+            cy = int(y + i * section_height + centroids[largest][1])
+        else:
+            cx = int(m10[i] / m00[i])
+            cy = int(m01[i] / m00[i])
+        deviations.append((cx, cy, cx - frame_center))
+
+        if i == 0:  # Topmost section of the line
+            top_dot = (cx, cy)
+
+    return deviations, middle_points, top_dot
@@ -0,0 +1,83 @@
+"""
+Ring of decoded frames in one multiprocessing.shared_memory block.
+
+Every slot holds a header (SLOT_HEADER: seq, height, width), a BGR plane and
+a gray plane sized for the largest frame allowed. The process that creates
+the ring writes decoded frames into free slots; other processes attach by
+name and get read-only numpy views of a slot, without copying.
+
+The ring does no locking of its own. Whoever hands out slot indices must not
+reuse a slot until every reader is done with it (fanout_server.py returns a
+slot to its free list only after all detectors replied for that frame).
+"""
+import struct
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+SLOT_HEADER = struct.Struct("<qII")
+ALIGNMENT = 64
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class FrameRing:
+    """
+    `slots` frames of up to max_width x max_height.
+
+        ring = FrameRing(slots=8)                      # owner
+        ring.write(slot, seq, frame, with_gray=True)
+        reader = FrameRing(slots=8, name=ring.name)    # another process
+        seq, bgr = reader.read(slot)
+        seq, gray = reader.read(slot, gray=True)
+    """
+
+    def __init__(self, slots=8, max_width=1280, max_height=720, name=None):
+        self.slots = slots
+        self.max_width = max_width
+        self.max_height = max_height
+        self.plane = max_width * max_height
+        self.bgr_offset = _aligned(SLOT_HEADER.size)
+        self.gray_offset = self.bgr_offset + _aligned(3 * self.plane)
+        self.slot_size = self.gray_offset + _aligned(self.plane)
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def _view(self, slot, height, width, gray):
+        base = slot * self.slot_size
+        if gray:
+            return np.ndarray((height, width), np.uint8, self.shm.buf, base + self.gray_offset)
+        return np.ndarray((height, width, 3), np.uint8, self.shm.buf, base + self.bgr_offset)
+
+    def write(self, slot, seq, frame, with_gray=False):
+        """Copies a decoded frame (BGR or gray) into slot; with_gray also fills the gray plane."""
+        height, width = frame.shape[:2]
+        if width > self.max_width or height > self.max_height:
+            raise ValueError(f"Frame {width}x{height} exceeds the ring's {self.max_width}x{self.max_height}")
+        if frame.ndim == 2:
+            np.copyto(self._view(slot, height, width, True), frame)
+        else:
+            np.copyto(self._view(slot, height, width, False), frame)
+            if with_gray:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._view(slot, height, width, True))
+        SLOT_HEADER.pack_into(self.shm.buf, slot * self.slot_size, seq, height, width)
+
+    def read(self, slot, gray=False):
+        """(seq, read-only view of the slot's BGR or gray plane). Drop the view before close()."""
+        seq, height, width = SLOT_HEADER.unpack_from(self.shm.buf, slot * self.slot_size)
+        view = self._view(slot, height, width, gray)
+        view.flags.writeable = False
+        return seq, view
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -30,13 +30,14 @@ def detect_stop_symbol(frame):
     
     return "CONTINUE"
 
-# Test the function with an image
-image_path = "C:/Users/ASUS_PC/Downloads/stop_sign_line.jpg"
-image = cv2.imread(image_path)
-status = detect_stop_symbol(image)
-print("Robot Status:", status)
+if __name__ == "__main__":
+    # Test the function with an image
+    image_path = "C:/Users/ASUS_PC/Downloads/stop_sign_line.jpg"
+    image = cv2.imread(image_path)
+    status = detect_stop_symbol(image)
+    print("Robot Status:", status)
 
-# Display the image (for debugging)
-cv2.imshow("Image", image)
-cv2.waitKey(0)
-cv2.destroyAllWindows()
+    # Display the image (for debugging)
+    cv2.imshow("Image", image)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
@@ -0,0 +1,293 @@
+"""
+Reference client for the frame servers.
+
+Speaks the servers' protocol (8-byte "Q" length + JPEG per frame, a reply per
+frame) and keeps the link from building a backlog:
+
+  - at most max_in_flight frames are sent without a reply; frames captured
+    while the window is full are skipped, so what is sent is always fresh
+  - an AdaptiveController lowers the JPEG quality, then the resolution, then
+    the frame rate while the measured reply latency is above target, and
+    raises them again once it is well below
+
+Text replies have no framing, so more than one frame in flight needs the
+servers' binary replies (BINARY_REPLIES / --binary). With binary replies a
+server that drops frames (PIPELINED) is handled too: the reply to frame n
+settles every earlier frame still waiting.
+
+    python stream_client.py --host 192.168.1.10 --source 0 --binary --max-in-flight 2
+    python stream_client.py --host 192.168.1.10 --source run.mp4 --target-latency 0.08
+"""
+import argparse
+import collections
+import socket
+import struct
+import threading
+import time
+
+import cv2
+
+from reply_protocol import recv_reply
+
+HEADER = struct.Struct("Q")
+
+
+class AdaptiveController:
+    """
+    Chooses (JPEG quality, resolution scale, frame rate) from reply latencies.
+
+    The settings form a ladder from best to cheapest: the quality is lowered
+    first, then the resolution, then the frame rate. A smoothed latency
+    (exponential moving average, weight alpha) above target_latency moves one
+    step down the ladder, one below target_latency * headroom moves one step
+    up. After every step the controller waits for `hold` replies, so that the
+    next decision sees the effect of the new settings.
+    """
+
+    def __init__(self, target_latency=0.1, qualities=(90, 75, 60, 45), scales=(1.0, 0.75, 0.5),
+                 rates=(30, 20, 10, 5), alpha=0.3, headroom=0.5, hold=5):
+        self.target_latency = target_latency
+        self.alpha = alpha
+        self.headroom = headroom
+        self.hold = hold
+        self.ladder = ([(quality, scales[0], rates[0]) for quality in qualities]
+                       + [(qualities[-1], scale, rates[0]) for scale in scales[1:]]
+                       + [(qualities[-1], scales[-1], rate) for rate in rates[1:]])
+        self.level = 0
+        self.latency = None
+        self.since_change = 0
+
+    @property
+    def settings(self):
+        """Current (quality, scale, fps)."""
+        return self.ladder[self.level]
+
+    def observe(self, latency):
+        """Feeds one reply latency in seconds. Returns True if the settings changed."""
+        self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+        self.since_change += 1
+        if self.since_change < self.hold:
+            return False
+        if self.latency > self.target_latency and self.level < len(self.ladder) - 1:
+            self.level += 1
+        elif self.latency < self.target_latency * self.headroom and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self.since_change = 0
+        return True
+
+
+class StreamClient:
+    """
+    Sends frames to a server and matches its replies to them.
+
+    send(frame) encodes with the controller's current settings and returns
+    False without sending when max_in_flight frames are unanswered. Replies
+    are read on a background thread; on_reply(reply, latency) is called for
+    each one, with a reply_protocol.Reply in binary mode and the text
+    otherwise.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, max_in_flight=1, binary=False, controller=None,
+                 on_reply=None, history=1000):
+        if not binary and max_in_flight != 1:
+            raise ValueError("Text replies cannot be matched to frames; max_in_flight > 1 needs binary replies")
+        self.address = (host, port)
+        self.max_in_flight = max_in_flight
+        self.binary = binary
+        self.controller = controller or AdaptiveController()
+        self.on_reply = on_reply
+
+        self.conn = None
+        self.reader = None
+        self.condition = threading.Condition()
+        self.pending = collections.OrderedDict()  # seq -> time sent, oldest first
+        self.next_seq = 0
+        self.connected = False
+        self.frames_sent = 0
+        self.frames_skipped = 0  # Not sent because the window was full
+        self.frames_dropped = 0  # Sent, but the server replied to a later frame instead
+        self.bytes_sent = 0
+        self.latencies = collections.deque(maxlen=history)
+
+    def connect(self):
+        self.conn = socket.create_connection(self.address)
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connected = True
+        self.reader = threading.Thread(target=self._reply_loop, daemon=True)
+        self.reader.start()
+
+    def encode(self, frame):
+        """JPEG bytes of frame at the controller's current quality and scale."""
+        quality, scale, _ = self.controller.settings
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return jpeg.tobytes()
+
+    def send(self, frame, block=False):
+        """Sends one frame unless the window is full (or waits for room if block). Returns True if it was sent."""
+        with self.condition:
+            if block:
+                self.condition.wait_for(lambda: len(self.pending) < self.max_in_flight or not self.connected)
+            if len(self.pending) >= self.max_in_flight or not self.connected:
+                self.frames_skipped += 1
+                return False
+        jpeg = self.encode(frame)
+        with self.condition:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending[seq] = time.monotonic()
+        try:
+            self.conn.sendall(HEADER.pack(len(jpeg)) + jpeg)
+        except OSError as error:
+            print(f"Connection lost while sending: {error}")
+            with self.condition:
+                self.pending.pop(seq, None)
+                self.connected = False  # stream() stops at its next frame
+                self.condition.notify_all()
+            return False
+        self.frames_sent += 1
+        self.bytes_sent += HEADER.size + len(jpeg)
+        return True
+
+    def _read_reply(self):
+        """Returns (seq, reply) of the next reply, or None when the server closes."""
+        if self.binary:
+            reply = recv_reply(self.conn)
+            return None if reply is None else (reply.seq, reply)
+        data = self.conn.recv(64)
+        if not data:
+            return None
+        with self.condition:
+            seq = next(iter(self.pending), -1)
+        return seq, data.decode()
+
+    def _reply_loop(self):
+        try:
+            while True:
+                result = self._read_reply()
+                if result is None:
+                    break
+                seq, reply = result
+                received_at = time.monotonic()
+                with self.condition:
+                    # Older frames that are still waiting were dropped by the server
+                    while self.pending and next(iter(self.pending)) < seq:
+                        self.pending.popitem(last=False)
+                        self.frames_dropped += 1
+                    sent_at = self.pending.pop(seq, None)
+                    if sent_at is not None:
+                        latency = received_at - sent_at
+                        self.latencies.append(latency)
+                        self.controller.observe(latency)
+                    self.condition.notify_all()
+                if sent_at is not None and self.on_reply is not None:
+                    self.on_reply(reply, latency)
+        except OSError:
+            pass
+        finally:
+            with self.condition:
+                self.connected = False
+                self.condition.notify_all()
+
+    def stream(self, frames, source_fps=None, duration=None):
+        """
+        Sends frames from an iterable at no more than the controller's frame
+        rate. Frames that come too early or while the window is full are
+        skipped. With source_fps the iterable is read at that rate, as a
+        camera would deliver it (for files and generated frames).
+        """
+        start = time.monotonic()
+        next_send = start
+        for i, frame in enumerate(frames):
+            if source_fps:
+                delay = start + i / source_fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            now = time.monotonic()
+            if duration is not None and now - start >= duration or not self.connected:
+                break
+            if now < next_send:
+                continue
+            if self.send(frame):
+                next_send = max(next_send + 1.0 / self.controller.settings[2], now)
+
+    def wait(self, timeout=1.0):
+        """Waits for the replies to all frames in flight. Returns False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending or not self.connected, timeout)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.conn.close()
+        if self.reader is not None:
+            self.reader.join()
+
+    def report(self):
+        """One-line summary of frames, latency and the current settings."""
+        latencies = sorted(self.latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            latency_text = f"latency p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+        else:
+            latency_text = "no replies"
+        quality, scale, fps = self.controller.settings
+        return (f"Sent {self.frames_sent} frames ({self.bytes_sent / 1024:.0f} KiB), skipped {self.frames_skipped}, "
+                f"dropped by server {self.frames_dropped}; {latency_text}; now quality {quality}, "
+                f"scale {scale}, {fps} fps")
+
+
+def capture_frames(capture):
+    """Yields frames from an opened cv2.VideoCapture until it ends."""
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            return
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--binary", action="store_true", help="the server sends binary replies (BINARY_REPLIES)")
+    parser.add_argument("--max-in-flight", type=int, default=1, help="unanswered frames allowed (>1 needs --binary)")
+    parser.add_argument("--target-latency", type=float, default=0.1, help="seconds from send to reply")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--verbose", action="store_true", help="print every reply")
+    args = parser.parse_args()
+
+    camera = args.source.isdigit()
+    capture = cv2.VideoCapture(int(args.source) if camera else args.source)
+    if not capture.isOpened():
+        raise SystemExit(f"Cannot open {args.source}")
+    # A camera delivers frames at its own rate; a file is read at its recorded rate
+    source_fps = None if camera else (capture.get(cv2.CAP_PROP_FPS) or 30)
+
+    on_reply = (lambda reply, latency: print(f"{latency * 1000:6.1f} ms  {reply}")) if args.verbose else None
+    client = StreamClient(args.host, args.port, args.max_in_flight, args.binary,
+                          AdaptiveController(args.target_latency), on_reply)
+    client.connect()
+    try:
+        client.stream(capture_frames(capture), source_fps, args.duration)
+        client.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+        capture.release()
+        print(client.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Append-only log of the incoming JPEG stream, and a replay tool for it.
+
+Servers record every received frame (with its receive time) and the decision
+sent back into one log file plus a fixed-size index file next to it. The
+replay tool memory-maps the log and feeds the frames to any detector, either
+at the original pacing or as fast as possible.
+
+    python stream_log.py info run.lflog
+    python stream_log.py replay run.lflog --detector line --fast
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"LFLOG1\0\0"
+RECORD = struct.Struct("<4sQdI")  # kind, frame sequence number, wall-clock timestamp, payload length
+INDEX = struct.Struct("<4sQQdI")  # kind, frame sequence number, payload offset in the log, timestamp, payload length
+FRAME = b"FRAM"
+DECISION = b"DECI"
+
+
+class StreamRecorder:
+    """Appends frames and decisions to a log file, and one fixed-size entry per record to its .idx index."""
+
+    def __init__(self, path, flush_every=30):
+        self.path = path
+        self.flush_every = flush_every
+        self.seq = 0
+        entries = []
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Continue the sequence numbers of an existing log (and restore its index if it was deleted)
+            existing = StreamLog(path)
+            self.seq = existing.next_seq()
+            if not os.path.exists(path + ".idx"):
+                entries = existing.entries
+            existing.close()
+
+        self.log = open(path, "ab")
+        if self.log.tell() == 0:
+            self.log.write(MAGIC)
+        self.index = open(path + ".idx", "ab")
+        for entry in entries:
+            self.index.write(INDEX.pack(*entry))
+
+    def _append(self, kind, seq, payload, timestamp):
+        timestamp = timestamp or time.time()
+        self.log.write(RECORD.pack(kind, seq, timestamp, len(payload)))
+        self.index.write(INDEX.pack(kind, seq, self.log.tell(), timestamp, len(payload)))
+        self.log.write(payload)
+
+    def record_frame(self, payload, timestamp=None):
+        """Appends one JPEG payload and returns its sequence number."""
+        seq = self.seq
+        self._append(FRAME, seq, payload, timestamp)
+        self.seq += 1
+        if self.seq % self.flush_every == 0:
+            self.flush()
+        return seq
+
+    def record_decision(self, seq, reply, timestamp=None):
+        self._append(DECISION, seq, reply.encode() if isinstance(reply, str) else reply, timestamp)
+
+    def flush(self):
+        self.log.flush()
+        self.index.flush()
+
+    def close(self):
+        self.log.close()
+        self.index.close()
+
+
+class StreamLog:
+    """Memory-mapped reader. Frame payloads are returned as zero-copy memoryviews of the map."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a stream log")
+        self.view = memoryview(self.map)
+
+        self.entries = list(self._entries(path + ".idx"))
+        frames, decisions = [], {}
+        for kind, seq, offset, timestamp, length in self.entries:
+            if kind == FRAME:
+                frames.append((seq, offset, timestamp, length))
+            elif kind == DECISION:
+                decisions[seq] = bytes(self.map[offset:offset + length]).decode()
+        self.frames, self.decisions = frames, decisions
+
+    def _entries(self, index_path):
+        """Index entries whose payload is completely in the log; rebuilt from the record headers if the index is missing."""
+        end = len(self.map)
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                index = f.read()
+            for entry in INDEX.iter_unpack(index[:len(index) - len(index) % INDEX.size]):
+                if entry[2] + entry[4] > end:
+                    return  # Server stopped mid-write
+                yield entry
+            return
+
+        offset = len(MAGIC)
+        while offset + RECORD.size <= end:
+            kind, seq, timestamp, length = RECORD.unpack_from(self.map, offset)
+            offset += RECORD.size
+            if offset + length > end:
+                return
+            yield kind, seq, offset, timestamp, length
+            offset += length
+
+    def next_seq(self):
+        return self.frames[-1][0] + 1 if self.frames else 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        """Yields (seq, timestamp, payload memoryview, recorded decision or None)."""
+        for seq, offset, timestamp, length in self.frames:
+            yield seq, timestamp, self.view[offset:offset + length], self.decisions.get(seq)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+def replay(path, detector, fast=False):
+    """Runs detector over every frame in the log and prints throughput and decision changes."""
+    from async_server import ERROR_FIELDS, run_detector
+
+    log = StreamLog(path)
+    changed = failed = 0
+    start = time.perf_counter()
+    first_timestamp = None
+    busy = 0.0
+
+    try:
+        for seq, timestamp, payload, recorded in log:
+            if not fast:
+                first_timestamp = first_timestamp or timestamp
+                delay = (timestamp - first_timestamp) - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            t0 = time.perf_counter()
+            try:
+                reply = run_detector(detector, payload)
+            except Exception as error:
+                # The servers answer such frames (e.g. undecodable ones) with STOP; replay does the same
+                print(f"frame {seq}: failed with {error!r}")
+                reply = ERROR_FIELDS["decision"]
+                failed += 1
+            finally:
+                payload.release()  # The map can only be closed once no views into it are left
+            busy += time.perf_counter() - t0
+
+            if recorded is not None and reply != recorded:
+                changed += 1
+                print(f"frame {seq}: recorded {recorded!r}, now {reply!r}")
+
+        frames = len(log)
+        elapsed = time.perf_counter() - start
+        print(f"{frames} frames in {elapsed:.2f} s ({frames / max(elapsed, 1e-9):.1f} FPS), "
+              f"detector {frames / max(busy, 1e-9):.1f} FPS, {changed} decisions changed, {failed} frames failed")
+    finally:
+        log.close()
+
+
+def main():
+    from async_server import DETECTORS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="summarize a log")
+    info.add_argument("log")
+    play = commands.add_parser("replay", help="feed a log to a detector")
+    play.add_argument("log")
+    play.add_argument("--detector", choices=sorted(DETECTORS), default="line")
+    play.add_argument("--fast", action="store_true", help="as fast as possible instead of the original pacing")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        log = StreamLog(args.log)
+        if log.frames:
+            duration = log.frames[-1][2] - log.frames[0][2]
+            size = sum(length for _, _, _, length in log.frames)
+            print(f"{len(log)} frames, {len(log.decisions)} decisions, {duration:.1f} s, "
+                  f"{size / len(log) / 1024:.1f} KiB per frame")
+        else:
+            print("empty log")
+        log.close()
+    else:
+        replay(args.log, args.detector, args.fast)
+
+
+if __name__ == "__main__":
+    main()
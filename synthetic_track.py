@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+BACKGROUND = (200, 200, 200)
+LINE_COLORS = {
+    # Dark, saturated BGR colors: below the black threshold in gray, inside the HSV ranges of the detectors
+    "BLACK": (20, 20, 20),
+    "RED": (0, 0, 150),
+    "GREEN": (0, 100, 0),
+    "BLUE": (150, 0, 0),
+}
+
+SCENES = ["straight", "curve", "sharp_left", "sharp_right", "red", "green", "blue",
+          "stop_bars", "grid_stop", "grid_past_line"]
+CONDITIONS = ["clean", "dim", "bright_gradient", "noise"]
+
+
+def _line_points(scene, width, height, rng):
+    """Centerline of the track (list of (x, y) from bottom to top) for line scenes."""
+    cx = width // 2
+    bottom = cx + int(rng.uniform(-0.3, 0.3) * width)
+
+    if scene == "curve":
+        top = cx + int(rng.uniform(-0.35, 0.35) * width)
+        control = cx + int(rng.uniform(-0.4, 0.4) * width)
+        t = np.linspace(0, 1, 32)
+        xs = (1 - t) ** 2 * bottom + 2 * (1 - t) * t * control + t ** 2 * top
+        ys = (1 - t) * height
+        return np.stack([xs, ys], axis=1).astype(np.int32)
+
+    if scene in ("sharp_left", "sharp_right"):
+        corner_y = int(height * rng.uniform(0.3, 0.5))
+        end_x = int(width * 0.05) if scene == "sharp_left" else int(width * 0.95)
+        return np.array([[bottom, height], [bottom, corner_y], [end_x, corner_y]], dtype=np.int32)
+
+    top = bottom + int(rng.uniform(-0.1, 0.1) * width)
+    return np.array([[bottom, height], [top, 0]], dtype=np.int32)
+
+
+def _section_offsets(line_mask, frame_center, sections=4):
+    """Offset of the line from the frame center in the top and bottom sections of its bounding box."""
+    ys, xs = np.nonzero(line_mask)
+    if len(xs) == 0:
+        return None, None
+    y0, y1 = ys.min(), ys.max() + 1
+    section_height = max((y1 - y0) // sections, 1)
+    top = xs[ys < y0 + section_height]
+    bottom = xs[(ys >= y0 + (sections - 1) * section_height) & (ys < y0 + sections * section_height)]
+    top_offset = int(top.mean()) - frame_center if len(top) else None
+    bottom_offset = int(bottom.mean()) - frame_center if len(bottom) else None
+    return top_offset, bottom_offset
+
+
+def _apply_condition(frame, condition, rng):
+    if condition == "dim":
+        return (frame * 0.55).astype(np.uint8)
+    if condition == "bright_gradient":
+        gain = np.linspace(0.8, 1.3, frame.shape[1])[None, :, None]
+        return np.clip(frame * gain, 0, 255).astype(np.uint8)
+    if condition == "noise":
+        return np.clip(frame + rng.normal(0, 12, frame.shape), 0, 255).astype(np.uint8)
+    return frame
+
+
+def generate_frame(scene, condition, width, height, seed=0):
+    """
+    Renders one synthetic track frame and its ground truth.
+
+    Ground truth keys:
+        top_offset, bottom_offset: line offset from the frame center (px) in the
+            top and bottom section, or None where the line task does not apply
+        color: color of the line
+        stop_bars: True when a double-bar stop symbol is present
+        grid: expected "STOP" / "PAST_LINE" / "FORWARD" of the 2x2 box detector
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+    line_mask = np.zeros((height, width), dtype=np.uint8)
+    thickness = max(int(width * 0.06), 3)
+
+    color = scene.upper() if scene in ("red", "green", "blue") else "BLACK"
+    points = _line_points(scene if color == "BLACK" else "straight", width, height, rng)
+    cv2.polylines(line_mask, [points], False, 255, thickness)
+
+    truth = {"scene": scene, "condition": condition, "color": color, "stop_bars": False, "grid": "FORWARD"}
+    truth["top_offset"], truth["bottom_offset"] = _section_offsets(line_mask, width // 2)
+
+    if scene == "stop_bars":
+        # Two thin bars across the line, close together (matches the 10-50 px spacing at 640x480)
+        bar = max(height // 60, 2)
+        gap = max(height // 20, 6)
+        y = int(height * rng.uniform(0.3, 0.6))
+        cv2.rectangle(line_mask, (width // 4, y), (3 * width // 4, y + bar), 255, -1)
+        cv2.rectangle(line_mask, (width // 4, y + bar + gap), (3 * width // 4, y + 2 * bar + gap), 255, -1)
+        truth.update(stop_bars=True, top_offset=None, bottom_offset=None)
+    elif scene in ("grid_stop", "grid_past_line"):
+        # A wide black band covering both box rows (STOP) or only the bottom row (PAST_LINE)
+        y0 = int(height * 0.45) if scene == "grid_stop" else int(height * 0.75)
+        cv2.rectangle(line_mask, (int(width * 0.15), y0), (int(width * 0.85), int(height * 0.95)), 255, -1)
+        truth.update(grid="STOP" if scene == "grid_stop" else "PAST_LINE", top_offset=None, bottom_offset=None)
+
+    frame[line_mask > 0] = LINE_COLORS[color]
+    return _apply_condition(frame, condition, rng), truth
+
+
+def generate_dataset(width, height, per_scene=3, seed=0):
+    """Yields (frame, truth) for every scene x condition, per_scene variations each. Deterministic for a seed."""
+    for s, scene in enumerate(SCENES):
+        for c, condition in enumerate(CONDITIONS):
+            for i in range(per_scene):
+                yield generate_frame(scene, condition, width, height, seed=hash((seed, s, c, i)) & 0xFFFFFFFF)